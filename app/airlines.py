@@ -7,4 +7,25 @@ VALID_AIRLINES = {
     "Air India",
     "Thai AirAsia",
     "Myanmar Airways International",
-}
\ No newline at end of file
+}
+
+# Informal spellings users type, mapped to the canonical airline name
+AIRLINE_ALIASES = {
+    "vietjet": "VietJet Air",
+    "viet jet": "VietJet Air",
+    "vietjet air": "VietJet Air",
+    "vietnam airlines": "Vietnam Airlines",
+    "vietnam air": "Vietnam Airlines",
+    "thai vietjet": "Thai VietJet Air",
+    "thai vietjet air": "Thai VietJet Air",
+    "hahn air": "Hahn Air Systems",
+    "hahn air systems": "Hahn Air Systems",
+    "indigo": "IndiGo",
+    "air india": "Air India",
+    "airasia": "Thai AirAsia",
+    "air asia": "Thai AirAsia",
+    "thai airasia": "Thai AirAsia",
+    "thai air asia": "Thai AirAsia",
+    "myanmar airways": "Myanmar Airways International",
+    "myanmar airways international": "Myanmar Airways International",
+}
@@ -0,0 +1,121 @@
+import re
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from typing import Iterator, List, Sequence, Tuple
+import tiktoken
+from config import EMBEDDING_MODEL, CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS
+
+_PARAGRAPH_BREAK = re.compile(r'\n[ \t]*\n\s*')
+_SENTENCE_END = set('.!?\n')
+
+@lru_cache(maxsize=None)
+def get_encoder(model: str = EMBEDDING_MODEL) -> tiktoken.Encoding:
+    """Process-wide tokenizer; building one loads and compiles the BPE ranks"""
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+def _is_heading(paragraph: str) -> bool:
+    # A short single line without closing punctuation, e.g. "Cabin Baggage" or "2. Excess Fees"
+    paragraph = paragraph.strip()
+    return '\n' not in paragraph and len(paragraph) <= 80 and paragraph[-1] not in '.!?,;'
+
+def _paragraph_spans(text: str) -> Iterator[Tuple[int, int]]:
+    start = 0
+    for match in _PARAGRAPH_BREAK.finditer(text):
+        if text[start:match.start()].strip():
+            yield start, match.start()
+        start = match.end()
+    if text[start:].strip():
+        yield start, len(text)
+
+def section_spans(text: str) -> Iterator[Tuple[int, int, int]]:
+    """(start, heading_end, end) character spans: each heading with the paragraphs under it"""
+    section = None
+    for start, end in _paragraph_spans(text):
+        if _is_heading(text[start:end]):
+            if section is not None and section[2] > section[1]:
+                yield section
+                section = None
+            # Consecutive headings ("BAGGAGE POLICY" / "Cabin Baggage") form one heading
+            section = (section[0], end, end) if section is not None else (start, end, end)
+        elif section is None:
+            section = (start, start, end)
+        else:
+            section = (section[0], section[1], end)
+    if section is not None:
+        yield section
+
+def _chunks(text: str, tokens: Sequence[int], max_tokens: int, overlap: int) -> Iterator[str]:
+    _, offsets = get_encoder().decode_with_offsets(list(tokens))
+
+    def char(i: int) -> int:
+        return offsets[i] if i < len(offsets) else len(text)
+
+    def first_token(position: int) -> int:
+        # The token containing `position`; a token may start with the whitespace before it
+        return max(bisect_right(offsets, position) - 1, 0)
+
+    def end_token(position: int) -> int:
+        return bisect_left(offsets, position)
+
+    def sentence_end(lo: int, hi: int) -> int:
+        for i in range(hi, lo, -1):
+            if text[char(i) - 1] in _SENTENCE_END:
+                return i
+        return hi
+
+    def windows(start: int, heading_end: int, end: int) -> Iterator[str]:
+        # An oversized section is cut into overlapping windows, each repeating its heading
+        if heading_end - start > max_tokens // 2:
+            heading_end = start
+        heading = text[char(start):char(heading_end)].strip()
+        prefix = f"{heading}\n\n" if heading else ""
+        budget = max_tokens - (heading_end - start)
+        position = heading_end
+        while True:
+            stop = min(position + budget, end)
+            if stop < end:
+                stop = sentence_end(position + budget // 2, stop)
+            yield prefix + text[char(position):char(stop)].strip()
+            if stop >= end:
+                return
+            position = max(stop - overlap, position + 1)
+
+    chunk_start = chunk_end = None
+    for start, heading_end, end in section_spans(text):
+        start, heading_end, end = first_token(start), end_token(heading_end), end_token(end)
+        # Whole sections are packed together while they fit
+        if chunk_start is not None and end - chunk_start <= max_tokens:
+            chunk_end = end
+            continue
+        if chunk_start is not None:
+            yield text[char(chunk_start):char(chunk_end)].strip()
+            chunk_start = None
+        if end - start <= max_tokens:
+            chunk_start, chunk_end = start, end
+        else:
+            yield from windows(start, heading_end, end)
+    if chunk_start is not None:
+        yield text[char(chunk_start):char(chunk_end)].strip()
+
+def iter_chunks(text: str, max_tokens: int = CHUNK_MAX_TOKENS,
+                overlap: int = CHUNK_OVERLAP_TOKENS) -> Iterator[str]:
+    """
+    Streaming mode: yield chunks of at most `max_tokens` tokens as they are cut. The text is
+    encoded once; sections stay whole when they fit, and longer ones are split at sentence
+    ends into windows sharing `overlap` tokens.
+    """
+    tokens = get_encoder().encode(text, disallowed_special=())
+    yield from _chunks(text, tokens, max_tokens, overlap)
+
+def split_document(text: str, max_tokens: int = CHUNK_MAX_TOKENS,
+                   overlap: int = CHUNK_OVERLAP_TOKENS) -> List[str]:
+    return list(iter_chunks(text, max_tokens, overlap))
+
+def split_documents(texts: List[str], max_tokens: int = CHUNK_MAX_TOKENS,
+                    overlap: int = CHUNK_OVERLAP_TOKENS) -> List[List[str]]:
+    """Batch mode: encode all documents in parallel threads, then chunk each"""
+    token_lists = get_encoder().encode_batch(texts, disallowed_special=())
+    return [list(_chunks(text, tokens, max_tokens, overlap)) for text, tokens in zip(texts, token_lists)]
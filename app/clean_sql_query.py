@@ -1,65 +1,61 @@
-import re
+import hashlib
+from sql_tokenizer import TRIVIA, iter_tokens
+
+# Keywords written in upper case; identifiers, literals and everything else are kept as written
+SQL_KEYWORDS = frozenset({
+    'SELECT', 'DISTINCT', 'FROM', 'WHERE', 'AND', 'OR', 'NOT', 'IN', 'IS', 'NULL',
+    'LIKE', 'BETWEEN', 'EXISTS', 'AS', 'ON', 'USING', 'JOIN', 'LEFT', 'RIGHT', 'INNER',
+    'OUTER', 'CROSS', 'ORDER', 'GROUP', 'BY', 'HAVING', 'LIMIT', 'OFFSET', 'ASC', 'DESC',
+    'UNION', 'ALL', 'INTERSECT', 'EXCEPT', 'WITH', 'CASE', 'WHEN', 'THEN', 'ELSE', 'END',
+    'UPDATE', 'DELETE', 'INSERT', 'INTO', 'VALUES', 'SET'
+})
 
 def clean_sql_query(query: str) -> str:
-
+    """
+    Normalize LLM-generated SQL in one pass over its tokens: drop comments, markdown
+    fences and <|...|> markers, collapse whitespace, put one space after commas and
+    upper-case keywords. String literals and quoted identifiers are left untouched.
+    """
     # Handle case where query might be None or not a string
     if not isinstance(query, str):
         return ""
 
-    def remove_special_tokens(sql):
-        # Remove the END_RESPONSE token and any similar markers
-        sql = re.sub(r'<\|END_RESPONSE\|>', '', sql)
-        sql = re.sub(r'<\|.*?\|>', '', sql)  # Remove any similar tokens
-        return sql
-
-    def remove_sql_comments(sql):
-        # Remove single line comments
-        sql = re.sub(r'--.*$', '', sql, flags=re.MULTILINE)
-        # Remove multi-line comments
-        sql = re.sub(r'/\*.*?\*/', '', sql, flags=re.DOTALL)
-        return sql
-
-    def standardize_whitespace(sql):
-        # Replace multiple spaces with single space
-        sql = re.sub(r'\s+', ' ', sql)
-        # Add space after commas if missing
-        sql = re.sub(r',(?!\s)', ', ', sql)
-        # Remove space before commas
-        sql = re.sub(r'\s+,', ',', sql)
-        return sql.strip()
-
-    def remove_code_blocks(sql):
-        # Remove markdown code blocks
-        sql = re.sub(r'```sql\s*', '', sql)
-        sql = re.sub(r'```.*', '', sql)
-        # Remove backticks
-        sql = sql.replace('`', '')
-        return sql
-
-    def fix_quotes(sql):
-        # Standardize quotes for string literals
-        sql = re.sub(r'"([^"]*)"', r"'\1'", sql)
-        # Fix cases where there might be nested quotes
-        sql = re.sub(r"''", "'", sql)
-        return sql
-
-    def normalize_keywords(sql):
-        # Common SQL keywords to uppercase
-        keywords = ['SELECT', 'FROM', 'WHERE', 'AND', 'OR', 'ORDER BY', 
-                   'GROUP BY', 'LIMIT', 'JOIN', 'LEFT JOIN', 'RIGHT JOIN',
-                   'INNER JOIN', 'HAVING', 'UPDATE', 'DELETE', 'INSERT INTO']
-
-        # Case-insensitive replacement of keywords
-        pattern = r'\b(' + '|'.join(re.escape(word) for word in keywords) + r')\b'
-        sql = re.sub(pattern, lambda m: m.group(0).upper(), sql, flags=re.IGNORECASE)
-        return sql
-
-    # Apply cleaning steps in sequence
-    query = remove_special_tokens(query)
-    query = remove_code_blocks(query)
-    query = remove_sql_comments(query)
-    query = standardize_whitespace(query)
-    query = fix_quotes(query)
-    query = normalize_keywords(query)
-
-    return query
\ No newline at end of file
+    parts = []
+    space = False
+    for kind, text in iter_tokens(query):
+        if kind in TRIVIA:
+            space = True
+            continue
+        if text == ',':
+            parts.append(',')
+            space = True
+            continue
+        if space and parts:
+            parts.append(' ')
+        space = False
+        if kind == 'word' and text.upper() in SQL_KEYWORDS:
+            text = text.upper()
+        parts.append(text)
+
+    return ''.join(parts).strip()
+
+def canonical_sql(query: str) -> str:
+    """
+    Canonical spelling of a query: keywords upper case, unquoted identifiers lower case
+    (SQLite compares them case-insensitively), single spaces, no trailing semicolon.
+    Queries that differ only in layout, comments or identifier case share it.
+    """
+    parts = []
+    for kind, text in iter_tokens(query or ""):
+        if kind in TRIVIA:
+            continue
+        if kind == 'word':
+            text = text.upper() if text.upper() in SQL_KEYWORDS else text.lower()
+        parts.append(text)
+    while parts and parts[-1] == ';':
+        parts.pop()
+    return ' '.join(parts)
+
+def sql_fingerprint(query: str) -> str:
+    """Stable cache key for a query's text; see canonical_sql"""
+    return hashlib.sha256(canonical_sql(query).encode('utf-8')).hexdigest()[:32]
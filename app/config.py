@@ -1,19 +1,102 @@
 import logging
-from llm import get_llm
-from sqlalchemy import create_engine
-from langchain_community.utilities import SQLDatabase
+import os
+from functools import lru_cache
+from llm_gateway import get_gateway_llm, PRIORITY_ANSWER, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
 
-# LLM setup
-flight_llm = get_llm(model_name='deepseek-r1-distill-llama-70b', platform_name='GROQ')
-luggage_llm = get_llm(model_name='llama3.2:3b', platform_name='OLLAMA')
+# Per-stage model profiles (get_llm arguments). Intermediate stages only have their
+# output parsed, so they run cooler (R1 distills loop below ~0.5) and capped; the caps
+# leave room for R1's <think> reasoning, which alone often passes 2k tokens. Set
+# SQL_VERIFY_MODEL to route verification to a smaller, faster model.
+MODEL_PROFILES = {
+    'answer': dict(model_name='deepseek-r1-distill-llama-70b', platform_name='GROQ',
+                   priority=PRIORITY_ANSWER),
+    'sql': dict(model_name='deepseek-r1-distill-llama-70b', platform_name='GROQ',
+                temperature=0.5, max_tokens=8192, priority=PRIORITY_INTERACTIVE),
+    'verify': dict(model_name=os.getenv("SQL_VERIFY_MODEL", 'deepseek-r1-distill-llama-70b'),
+                   platform_name=os.getenv("SQL_VERIFY_PLATFORM", 'GROQ'),
+                   temperature=0.5, max_tokens=4096, priority=PRIORITY_INTERACTIVE),
+    'luggage': dict(model_name='llama3.2:3b', platform_name='OLLAMA', priority=PRIORITY_BACKGROUND),
+}
+
+# Per-provider admission control: calls beyond max_concurrency wait by priority in a
+# queue of at most max_queue, and are rejected straight away beyond that. Rate limits
+# are per minute; None disables them.
+LLM_PROVIDER_LIMITS = {
+    'GROQ': dict(max_concurrency=8, max_queue=32, requests_per_minute=30, tokens_per_minute=None),
+    'OLLAMA': dict(max_concurrency=2, max_queue=16),
+    'DEEPSEEK': dict(max_concurrency=8, max_queue=32),
+}
+# Retries of 429 and 5xx responses, with jittered exponential backoff
+LLM_MAX_RETRIES = 3
+
+# LLM setup; clients are built on first use so importing config stays cheap
+@lru_cache(maxsize=None)
+def get_stage_llm(stage: str):
+    """The gateway-wrapped model for a MODEL_PROFILES stage: answer, sql, verify or luggage"""
+    return get_gateway_llm(limits=LLM_PROVIDER_LIMITS, max_retries=LLM_MAX_RETRIES, **MODEL_PROFILES[stage])
 
 # Database setup
-URL = 'sqlite:///flights.db'
-engine = create_engine(URL, echo=False)
-db = SQLDatabase(engine)
+DB_PATH = 'flights.db'
+URL = f'sqlite:///{DB_PATH}'
+
+@lru_cache(maxsize=None)
+def get_engine():
+    from sqlalchemy import create_engine
+    return create_engine(URL, echo=False)
+
+# Read-only connections used to run generated queries off the event loop
+DB_POOL_SIZE = 4
+QUERY_TIMEOUT_SECONDS = 10
+
+# Query results cached in memory, keyed on canonical SQL, parameters and data version
+RESULT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+RESULT_CACHE_MAX_ENTRY_BYTES = 4 * 1024 * 1024
+# How often the data version is re-read, to notice loads made by another process
+DATA_VERSION_CHECK_SECONDS = 5
 
 # Maximum number of SQL generation attempts
 MAX_ATTEMPTS = 3
 
-logging.basicConfig(level=logging.ERROR)
+# Number of results the SQL prompt asks the model to return
+SQL_TOP_K = 5
+
+# Verified SQL cache in front of generate_sql
+SQL_CACHE_MAX_ENTRIES = 1024
+SQL_CACHE_TTL_SECONDS = 6 * 60 * 60
+# Ratio in (0, 1] to also serve near-identical phrasings of a cached question; None disables
+SQL_CACHE_SIMILARITY_THRESHOLD = None
+
+# Answer streaming: text is sent at sentence ends, or at word boundaries once it is
+# this old or this long
+ANSWER_FLUSH_MAX_LATENCY_SECONDS = 0.25
+ANSWER_FLUSH_MAX_CHARS = 200
+
+# Luggage policy retrieval
+POLICY_TOP_K = 3
+QUERY_EMBEDDING_CACHE_SIZE = 1024
+# Maximum concurrent per-airline policy lookups for one request
+LUGGAGE_CONCURRENCY = 4
+
+# Policy embeddings: OPENAI, or LOCAL for an offline hashing embedder (no network needed)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "OPENAI").upper()
+EMBEDDING_MODEL = 'text-embedding-ada-002'
+EMBEDDING_DIMENSIONS = 512  # LOCAL backend only
+EMBEDDING_BATCH_SIZE = 64
+EMBEDDING_CONCURRENCY = 4
+EMBEDDING_MAX_RETRIES = 3
+EMBEDDING_CACHE_DIR = './embeddings_cache'
+# Policy chunking: token budget per chunk and tokens shared by consecutive windows of a long section
+CHUNK_MAX_TOKENS = 500
+CHUNK_OVERLAP_TOKENS = 50
+
+# Persistent luggage answer cache, keyed on airline, question topic and policy file version
+LUGGAGE_CACHE_PATH = 'luggage_cache.db'
+LUGGAGE_CACHE_MAX_ENTRIES = 5000
+LUGGAGE_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60
+
+# Observability: LOG_LEVEL=INFO logs prompts and stage timings; TRACE_IDS=1 tags every SSE event
+# with a per-request trace id (clients can also pass their own as ?trace_id=)
+TRACE_IDS = os.getenv("TRACE_IDS", "0") == "1"
+
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "ERROR").upper())
 logger = logging.getLogger(__name__)
\ No newline at end of file
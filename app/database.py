@@ -1,53 +1,395 @@
+import re
 import sqlite3
 import json
+from datetime import datetime
+from functools import lru_cache
+from itertools import groupby, islice
+from operator import itemgetter
+from statistics import median
+from typing import Any, Dict, Iterable, Iterator, Optional, Set, Tuple
 
-def json_to_sqlite(json_file, sqlite_file):
+BATCH_SIZE = 5000
+
+FLIGHT_COLUMNS = (
+    'airline', 'time', 'date', 'duration', 'flightType',
+    'price_inr', 'origin', 'destination',
+    'originCountry', 'destinationCountry'
+)
+
+# Canonical, index-friendly copies of the free-form date, time and duration strings
+TYPED_COLUMNS = {
+    'flight_date': 'TEXT',
+    'departure_minutes': 'INTEGER',
+    'duration_minutes': 'INTEGER',
+}
+
+# A fare is identified by everything except its price and country labels,
+# so reloading a dump updates prices in place instead of appending duplicates.
+# SQLite treats NULLs as distinct in a UNIQUE index, so missing key values are stored as ''.
+NATURAL_KEY = ('airline', 'date', 'time', 'origin', 'destination', 'flightType', 'duration')
+
+SECONDARY_INDEXES = {
+    'idx_flights_route_date': ('origin', 'destination', 'flight_date'),
+    'idx_flights_price': ('price_inr',),
+    'idx_flights_airline': ('airline',),
+    'idx_flights_flight_type': ('flightType',),
+    'idx_flights_departure': ('departure_minutes',),
+    'idx_flights_duration': ('duration_minutes',),
+}
+
+# flightType values that mean a direct flight (kept in sync with sql_prompt)
+DIRECT_FLIGHT_TYPES = ('Nonstop', 'Direct', 'Non-stop', 'Non stop', 'Direct flight')
+
+# Fare aggregates per (origin, destination, flight_date), optionally split by one more dimension
+SUMMARY_TABLES = {
+    'route_fare_summary': (),
+    'route_airline_fare_summary': ('airline',),
+    'route_stops_fare_summary': ('is_direct',),
+}
+
+_INSERT_COLUMNS = FLIGHT_COLUMNS + tuple(TYPED_COLUMNS)
+_route_key = itemgetter(*(_INSERT_COLUMNS.index(column) for column in ('origin', 'destination', 'flight_date')))
+
+UPSERT_SQL = f'''INSERT INTO flights ({', '.join(_INSERT_COLUMNS)})
+                 VALUES ({', '.join('?' for _ in _INSERT_COLUMNS)})
+                 ON CONFLICT ({', '.join(NATURAL_KEY)}) DO UPDATE SET
+                     price_inr = excluded.price_inr,
+                     originCountry = excluded.originCountry,
+                     destinationCountry = excluded.destinationCountry'''
+
+_DATE_FORMATS = (
+    '%Y-%m-%d', '%d-%m-%Y', '%d/%m/%Y', '%Y/%m/%d', '%d.%m.%Y',
+    '%d %b %Y', '%d %B %Y', '%b %d %Y', '%B %d %Y',
+    '%a %b %d %Y', '%a %d %b %Y', '%A %B %d %Y', '%A %d %B %Y',
+)
+_TIME_PATTERN = re.compile(r'(\d{1,2})(?::|\.|h)(\d{2})\s*([ap])?\.?\s*m?\.?', re.IGNORECASE)
+_DURATION_PARTS = re.compile(
+    r'(?:(\d+)\s*d(?:ays?)?)?\s*(?:(\d+)\s*h(?:ours?|rs?)?)?\s*(?:(\d+)\s*m(?:in(?:ute)?s?)?)?',
+    re.IGNORECASE
+)
+_DURATION_CLOCK = re.compile(r'^(\d{1,2}):(\d{2})$')
+
+@lru_cache(maxsize=4096)
+def parse_flight_date(value: Optional[str]) -> Optional[str]:
+    """ISO date (YYYY-MM-DD) for a free-form date string, or None"""
+    if not value:
+        return None
+    text = re.sub(r'[,\s]+', ' ', str(value)).strip()
+    if re.match(r'^\d{4}-\d{2}-\d{2}', text):
+        text = text[:10]
+    text = re.sub(r'(\d)(st|nd|rd|th)\b', r'\1', text)
+    for date_format in _DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format).date().isoformat()
+        except ValueError:
+            continue
+    return None
+
+@lru_cache(maxsize=4096)
+def parse_departure_minutes(value: Optional[str]) -> Optional[int]:
+    """Minutes since midnight for a departure time like '22:15' or '10:30 PM' (first time of a range)"""
+    match = _TIME_PATTERN.search(str(value or ''))
+    if not match:
+        return None
+    hours, minutes, meridiem = int(match.group(1)), int(match.group(2)), (match.group(3) or '').lower()
+    if meridiem == 'p' and hours < 12:
+        hours += 12
+    elif meridiem == 'a' and hours == 12:
+        hours = 0
+    if hours > 23 or minutes > 59:
+        return None
+    return hours * 60 + minutes
+
+@lru_cache(maxsize=4096)
+def parse_duration_minutes(value: Optional[str]) -> Optional[int]:
+    """Total minutes for a duration like '5h 30m', '5 hr 30 min', '05:30' or 'PT5H30M'"""
+    text = str(value or '').strip().upper().removeprefix('PT')
+    clock = _DURATION_CLOCK.match(text)
+    if clock:
+        return int(clock.group(1)) * 60 + int(clock.group(2))
+    # Every part of the pattern is optional, so skip the empty matches before the first number
+    match = next((match for match in _DURATION_PARTS.finditer(text) if any(match.groups())), None)
+    if match is None:
+        return None
+    days, hours, minutes = (int(part or 0) for part in match.groups())
+    return days * 1440 + hours * 60 + minutes
+
+def iter_json_array(json_file, chunk_size: int = 1 << 16) -> Iterator[Dict[str, Any]]:
+    """Yield the items of a top-level JSON array without loading the whole file"""
+    decoder = json.JSONDecoder()
+    with open(json_file, 'r', encoding='utf-8') as file:
+        buffer = file.read(chunk_size).lstrip()
+        if not buffer.startswith('['):
+            raise ValueError("Expected a JSON array at the top level")
+        pos = 1
+        eof = False
+
+        while True:
+            # Skip separators between items
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if pos < len(buffer) and buffer[pos] == ']':
+                return
+
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                item, end = None, None
+
+            # Need more input: the item is cut off (or might be, if it ends the buffer)
+            if end is None or (end == len(buffer) and not eof):
+                if eof:
+                    raise ValueError(f"Truncated or invalid JSON near offset {pos}")
+                chunk = file.read(chunk_size)
+                eof = not chunk
+                buffer = buffer[pos:] + chunk
+                pos = 0
+                continue
+
+            yield item
+            pos = end
+
+def _flight_row(item: Dict[str, Any]) -> tuple:
+    values = (item.get(column) for column in FLIGHT_COLUMNS)
+    return tuple('' if value is None and column in NATURAL_KEY else value
+                 for column, value in zip(FLIGHT_COLUMNS, values)) + (
+        parse_flight_date(item.get('date')),
+        parse_departure_minutes(item.get('time')),
+        parse_duration_minutes(item.get('duration')),
+    )
+
+def _create_schema(cursor) -> bool:
+    """Create or upgrade the flights table; returns True when typed columns had to be added"""
+    cursor.execute('''CREATE TABLE IF NOT EXISTS flights (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        airline TEXT,
+                        time TEXT,
+                        date TEXT,
+                        duration TEXT,
+                        flightType TEXT,
+                        price_inr INTEGER,
+                        origin TEXT,
+                        destination TEXT,
+                        originCountry TEXT,
+                        destinationCountry TEXT,
+                        flight_date TEXT,
+                        departure_minutes INTEGER,
+                        duration_minutes INTEGER
+                    )''')
+
+    # Tables created before the typed columns existed get them added and backfilled
+    existing = {row[1] for row in cursor.execute("PRAGMA table_info(flights)")}
+    missing = [column for column in TYPED_COLUMNS if column not in existing]
+    for column in missing:
+        cursor.execute(f"ALTER TABLE flights ADD COLUMN {column} {TYPED_COLUMNS[column]}")
+    if missing:
+        _backfill_typed_columns(cursor)
+
+    _create_summary_tables(cursor)
+
+    has_key = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='index' AND name='idx_flights_natural_key'"
+    ).fetchone()
+    null_key = ' OR '.join(f"{column} IS NULL" for column in NATURAL_KEY)
+    has_null_keys = cursor.execute(f"SELECT 1 FROM flights WHERE {null_key} LIMIT 1").fetchone()
+    if not has_key or has_null_keys:
+        # Tables filled by earlier append-only loads, or loads that kept NULL key values,
+        # may hold duplicates; the most recently loaded copy of each fare is kept
+        key = ', '.join(NATURAL_KEY)
+        cursor.execute("DROP INDEX IF EXISTS idx_flights_natural_key")
+        for column in NATURAL_KEY:
+            cursor.execute(f"UPDATE flights SET {column} = '' WHERE {column} IS NULL")
+        cursor.execute(f"DELETE FROM flights WHERE id NOT IN (SELECT MAX(id) FROM flights GROUP BY {key})")
+        removed = cursor.rowcount
+        cursor.execute(f"CREATE UNIQUE INDEX idx_flights_natural_key ON flights ({key})")
+        if removed > 0:
+            print(f"Removed {removed} duplicate rows from 'flights' table.")
+            refresh_fare_summaries(cursor)
+    return bool(missing)
+
+def _create_summary_tables(cursor) -> None:
+    column_types = {'airline': 'TEXT', 'is_direct': 'INTEGER'}
+    for table, dimensions in SUMMARY_TABLES.items():
+        key = ('origin', 'destination', 'flight_date') + dimensions
+        extra = ''.join(f"{column} {column_types[column]}, " for column in dimensions)
+        cursor.execute(f'''CREATE TABLE IF NOT EXISTS {table} (
+                            origin TEXT,
+                            destination TEXT,
+                            flight_date TEXT,
+                            {extra}min_price_inr INTEGER,
+                            median_price_inr REAL,
+                            max_price_inr INTEGER,
+                            flight_count INTEGER,
+                            PRIMARY KEY ({', '.join(key)})
+                        ) WITHOUT ROWID''')
+
+def _summary_rows(route_key: Tuple, fares: Iterable[Tuple[str, str, int]]) -> Dict[str, list]:
+    """Aggregate (airline, flightType, price) fares of one route and date into rows per summary table"""
+    groups: Dict[str, Dict[tuple, list]] = {table: {} for table in SUMMARY_TABLES}
+    for airline, flight_type, price in fares:
+        groups['route_fare_summary'].setdefault((), []).append(price)
+        groups['route_airline_fare_summary'].setdefault((airline,), []).append(price)
+        is_direct = int(flight_type in DIRECT_FLIGHT_TYPES)
+        groups['route_stops_fare_summary'].setdefault((is_direct,), []).append(price)
+
+    return {
+        table: [route_key + dimension + (min(prices), median(prices), max(prices), len(prices))
+                for dimension, prices in by_dimension.items()]
+        for table, by_dimension in groups.items()
+    }
+
+def _write_summaries(cursor, route_key: Tuple, fares: Iterable[Tuple[str, str, int]]) -> None:
+    for table, rows in _summary_rows(route_key, fares).items():
+        cursor.execute(f"DELETE FROM {table} WHERE origin = ? AND destination = ? AND flight_date = ?", route_key)
+        if rows:
+            placeholders = ', '.join('?' for _ in rows[0])
+            cursor.executemany(f"INSERT INTO {table} VALUES ({placeholders})", rows)
+
+def refresh_fare_summaries(cursor, route_keys: Optional[Set[Tuple]] = None) -> None:
+    """
+    Recompute fare summaries for the given (origin, destination, flight_date) keys,
+    or rebuild them all from one ordered scan when no keys are given.
+    """
+    if route_keys is None:
+        for table in SUMMARY_TABLES:
+            cursor.execute(f"DELETE FROM {table}")
+        fares = cursor.execute('''SELECT origin, destination, flight_date, airline, flightType, price_inr
+                                  FROM flights
+                                  WHERE flight_date IS NOT NULL AND price_inr IS NOT NULL
+                                  ORDER BY origin, destination, flight_date''').fetchall()
+        for route_key, group in groupby(fares, key=lambda fare: fare[:3]):
+            _write_summaries(cursor, route_key, [fare[3:] for fare in group])
+        return
+
+    for route_key in route_keys:
+        if not all(route_key):
+            continue
+        fares = cursor.execute('''SELECT airline, flightType, price_inr FROM flights
+                                  WHERE origin = ? AND destination = ? AND flight_date = ?
+                                  AND price_inr IS NOT NULL''', route_key).fetchall()
+        _write_summaries(cursor, route_key, fares)
+
+def _backfill_typed_columns(cursor) -> None:
+    conn = cursor.connection
+    conn.create_function('parse_flight_date', 1, parse_flight_date, deterministic=True)
+    conn.create_function('parse_departure_minutes', 1, parse_departure_minutes, deterministic=True)
+    conn.create_function('parse_duration_minutes', 1, parse_duration_minutes, deterministic=True)
+    cursor.execute('''UPDATE flights SET
+                        flight_date = parse_flight_date(date),
+                        departure_minutes = parse_departure_minutes(time),
+                        duration_minutes = parse_duration_minutes(duration)''')
+
+def _create_indexes(cursor) -> None:
+    for name, columns in SECONDARY_INDEXES.items():
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON flights ({', '.join(columns)})")
+
+def _drop_indexes(cursor) -> None:
+    for name in SECONDARY_INDEXES:
+        cursor.execute(f"DROP INDEX IF EXISTS {name}")
+
+def json_to_sqlite(json_file, sqlite_file, batch_size: int = BATCH_SIZE):
     try:
-        with open(json_file, 'r') as file:
-            data = json.load(file)
-    except Exception as e:
+        items = iter_json_array(json_file)
+        first_batch = list(islice(items, batch_size))
+    except (OSError, ValueError) as e:
         print(f"Error reading JSON file: {e}")
         return
 
-    conn = sqlite3.connect(sqlite_file)
+    # Autocommit mode so the load below is a single explicit transaction
+    conn = sqlite3.connect(sqlite_file, isolation_level=None)
     cursor = conn.cursor()
+    # WAL lets the read-only query pool keep reading while data is loaded
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=OFF")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-65536")
 
     try:
         # Create the table if it doesn't exist
-        cursor.execute('''CREATE TABLE IF NOT EXISTS flights (
-                            id INTEGER PRIMARY KEY AUTOINCREMENT,
-                            airline TEXT,
-                            time TEXT,
-                            date TEXT,
-                            duration TEXT,
-                            flightType TEXT,
-                            price_inr INTEGER,
-                            origin TEXT,
-                            destination TEXT,
-                            originCountry TEXT,
-                            destinationCountry TEXT
-                        )''')
+        cursor.execute("BEGIN")
+        _create_schema(cursor)
+        cursor.execute("COMMIT")
         print("Table created (or already exists).")
     except sqlite3.Error as e:
         print(f"Error creating table: {e}")
         conn.close()
         return
 
+    total = 0
+    touched_routes = set()
     try:
-        # Insert data into the table
-        for item in data:
-            cursor.execute('''INSERT INTO flights (
-                                airline, time, date, duration, flightType,
-                                price_inr, origin, destination,
-                                originCountry, destinationCountry
-                            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
-                            (item['airline'], item['time'], item['date'],
-                             item['duration'], item['flightType'], item['price_inr'],
-                             item['origin'], item['destination'],
-                             item['originCountry'], item['destinationCountry']))
-        conn.commit()
-        print(f"Inserted {len(data)} records into 'flights' table.")
-    except sqlite3.Error as e:
+        # Upsert all rows in batches inside one transaction
+        cursor.execute("BEGIN")
+        # Building secondary indexes once after the load beats maintaining them per row, but
+        # dropping them changes the schema version and with it every cached SQL query and
+        # schema; so only the first load into an empty table does it
+        if not cursor.execute("SELECT 1 FROM flights LIMIT 1").fetchone():
+            _drop_indexes(cursor)
+        batch = first_batch
+        while batch:
+            rows = [_flight_row(item) for item in batch]
+            cursor.executemany(UPSERT_SQL, rows)
+            touched_routes.update(map(_route_key, rows))
+            total += len(batch)
+            batch = list(islice(items, batch_size))
+        _create_indexes(cursor)
+        # Only the routes and dates this load touched need their summaries recomputed
+        refresh_fare_summaries(cursor, touched_routes)
+        # Committed together with the rows, so cached query results keyed on it go stale atomically
+        data_version = cursor.execute("PRAGMA user_version").fetchone()[0] + 1
+        cursor.execute(f"PRAGMA user_version = {data_version}")
+        cursor.execute("COMMIT")
+        print(f"Upserted {total} records into 'flights' table.")
+
+        # Refresh planner statistics for the new data and indexes
+        cursor.execute("ANALYZE")
+    except (sqlite3.Error, ValueError) as e:
+        if conn.in_transaction:
+            cursor.execute("ROLLBACK")
         print(f"Error inserting data: {e}")
     finally:
-        conn.close()
\ No newline at end of file
+        conn.close()
+
+def migrate_flights_table(sqlite_file):
+    """Bring an already-loaded database up to the current schema and indexes"""
+    conn = sqlite3.connect(sqlite_file, isolation_level=None)
+    cursor = conn.cursor()
+    try:
+        cursor.execute("BEGIN")
+        if _create_schema(cursor):
+            # Indexes built over the old columns are rebuilt over the typed ones
+            _drop_indexes(cursor)
+        _create_indexes(cursor)
+        if not cursor.execute("SELECT 1 FROM route_fare_summary LIMIT 1").fetchone():
+            refresh_fare_summaries(cursor)
+        cursor.execute("COMMIT")
+    except sqlite3.Error as e:
+        if conn.in_transaction:
+            cursor.execute("ROLLBACK")
+        print(f"Error migrating flights table: {e}")
+    finally:
+        conn.close()
+
+def get_schema_version(sqlite_file):
+    """Return SQLite's schema cookie, which changes whenever any table or index is altered"""
+    conn = sqlite3.connect(sqlite_file)
+    try:
+        return conn.execute("PRAGMA schema_version").fetchone()[0]
+    finally:
+        conn.close()
+
+def get_data_version(sqlite_file):
+    """Return the data version json_to_sqlite bumps (in PRAGMA user_version) on every load"""
+    conn = sqlite3.connect(sqlite_file)
+    try:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
+
+def enable_wal(sqlite_file):
+    """Switch the database to write-ahead logging so concurrent readers don't serialize"""
+    conn = sqlite3.connect(sqlite_file)
+    try:
+        return conn.execute("PRAGMA journal_mode=WAL").fetchone()[0]
+    finally:
+        conn.close()
@@ -0,0 +1,94 @@
+import asyncio
+import sqlite3
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from config import DB_PATH, DB_POOL_SIZE, QUERY_TIMEOUT_SECONDS
+
+class QueryTimeoutError(Exception):
+    """Raised when a query runs longer than the pool's timeout"""
+
+class QueryResult(NamedTuple):
+    columns: Tuple[str, ...]
+    rows: List[tuple]
+
+@lru_cache(maxsize=256)
+def record_type(columns: Tuple[str, ...]):
+    """Named tuple type for a result shape; unusable names like MIN(price_inr) become _0, _1..."""
+    return namedtuple("Row", columns, rename=True)
+
+class ReadOnlyPool:
+    """
+    Bounded pool of read-only SQLite connections driven from a dedicated thread pool,
+    so queries never block the event loop. A query that times out or whose caller is
+    cancelled (e.g. the SSE client disconnected) is interrupted inside SQLite.
+    """
+
+    def __init__(self, path: str, size: int = 4, timeout: float = 10.0):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self._created = 0
+        self._idle: Optional[asyncio.Queue] = None
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="sqlite-read")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    async def _acquire(self) -> sqlite3.Connection:
+        if self._idle is None:
+            self._idle = asyncio.Queue()
+        if self._idle.empty() and self._created < self.size:
+            self._created += 1
+            try:
+                return await asyncio.get_running_loop().run_in_executor(self._executor, self._connect)
+            except BaseException:
+                self._created -= 1
+                raise
+        return await self._idle.get()
+
+    def _release(self, conn: sqlite3.Connection) -> None:
+        self._idle.put_nowait(conn)
+
+    @staticmethod
+    def _run(conn: sqlite3.Connection, sql: str, params) -> QueryResult:
+        cursor = conn.execute(sql, params or ())
+        try:
+            rows = cursor.fetchall()
+            columns = tuple(column[0] for column in cursor.description or ())
+        finally:
+            cursor.close()
+        if not columns:
+            return QueryResult(columns, [])
+        make_row = record_type(columns)._make
+        return QueryResult(columns, [make_row(row) for row in rows])
+
+    async def execute(self, sql: str, params: Optional[Dict[str, Any]] = None,
+                      timeout: Optional[float] = None) -> QueryResult:
+        conn = await self._acquire()
+        future = asyncio.get_running_loop().run_in_executor(self._executor, self._run, conn, sql, params)
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout or self.timeout)
+        except asyncio.TimeoutError as e:
+            conn.interrupt()
+            raise QueryTimeoutError(f"Query exceeded {timeout or self.timeout:g}s and was cancelled") from e
+        except asyncio.CancelledError:
+            conn.interrupt()
+            raise
+        finally:
+            # The connection goes back to the pool only once SQLite has let go of it
+            if future.done():
+                self._release(conn)
+            else:
+                future.add_done_callback(lambda f: (f.exception(), self._release(conn)))
+
+    def close(self) -> None:
+        while self._idle is not None and not self._idle.empty():
+            self._idle.get_nowait().close()
+        self._created = 0
+        self._executor.shutdown(wait=False)
+
+read_pool = ReadOnlyPool(DB_PATH, size=DB_POOL_SIZE, timeout=QUERY_TIMEOUT_SECONDS)
@@ -0,0 +1,102 @@
+import asyncio
+import hashlib
+import random
+import re
+from typing import List, Optional
+import numpy as np
+from config import (
+    logger, EMBEDDING_BACKEND, EMBEDDING_MODEL, EMBEDDING_DIMENSIONS,
+    EMBEDDING_BATCH_SIZE, EMBEDDING_CONCURRENCY, EMBEDDING_MAX_RETRIES
+)
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize each row so cosine similarity is a plain dot product"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+class OpenAIEmbedder:
+    """OpenAI embeddings API; one request embeds a whole batch of texts"""
+
+    def __init__(self, model: str = "text-embedding-ada-002"):
+        self.model = model
+        self.name = f"openai:{model}"
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            import openai
+            self._client = openai.AsyncOpenAI()
+        return self._client
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        response = await self.client.embeddings.create(model=self.model, input=texts)
+        ordered = sorted(response.data, key=lambda item: item.index)
+        return np.asarray([item.embedding for item in ordered], dtype=np.float32)
+
+class HashingEmbedder:
+    """
+    Offline stand-in for the embeddings API: words and word bigrams are hashed into a
+    fixed number of signed buckets. Deterministic and dependency-free, so the index
+    can be built and searched without network access.
+    """
+
+    def __init__(self, dimensions: int = 512):
+        self.dimensions = dimensions
+        self.name = f"hashing:{dimensions}"
+
+    def _vector(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        words = re.findall(r"\w+", text.lower())
+        for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            digest = hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest()
+            value = int.from_bytes(digest, 'little')
+            vector[value % self.dimensions] += 1.0 if value >> 63 else -1.0
+        return vector
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        return np.vstack([self._vector(text) for text in texts]) if texts else \
+            np.zeros((0, self.dimensions), dtype=np.float32)
+
+def create_embedder(backend: str = EMBEDDING_BACKEND):
+    if backend == "OPENAI":
+        return OpenAIEmbedder(EMBEDDING_MODEL)
+    elif backend == "LOCAL":
+        return HashingEmbedder(EMBEDDING_DIMENSIONS)
+    raise ValueError(f"Unknown embedding backend: {backend}")
+
+embedder = create_embedder()
+
+async def _embed_batch(texts: List[str], max_retries: int):
+    for attempt in range(max_retries + 1):
+        try:
+            return await embedder.embed(texts)
+        except Exception as e:
+            if attempt == max_retries:
+                raise
+            # Exponential backoff with jitter so concurrent batches don't retry in lockstep
+            delay = min(2 ** attempt, 30) * (0.5 + random.random())
+            logger.warning("Embedding batch of %d failed (%s), retrying in %.1fs", len(texts), e, delay)
+            await asyncio.sleep(delay)
+
+async def embed_texts(texts: List[str], batch_size: int = EMBEDDING_BATCH_SIZE,
+                      concurrency: int = EMBEDDING_CONCURRENCY,
+                      max_retries: int = EMBEDDING_MAX_RETRIES) -> np.ndarray:
+    """Embed texts in batches, at most `concurrency` requests in flight; rows are L2-normalized"""
+    if not texts:
+        return np.zeros((0, 0), dtype=np.float32)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(batch: List[str]):
+        async with semaphore:
+            return await _embed_batch(batch, max_retries)
+
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    results = await asyncio.gather(*(run(batch) for batch in batches))
+    return normalize_rows(np.vstack(results))
+
+def content_hash(text: str, model: Optional[str] = None) -> str:
+    """Cache key of a chunk's embedding: its text and the model that embeds it"""
+    return hashlib.sha256(f"{model or embedder.name}\0{text}".encode('utf-8')).hexdigest()
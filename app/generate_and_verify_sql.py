@@ -1,46 +1,109 @@
-from typing import Tuple
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Callable, Dict, Tuple
 from sqlite3 import Error as SQLiteError
-from langchain.chains import create_sql_query_chain # pylint: disable=no-name-in-module
 from sqlalchemy.exc import SQLAlchemyError
 from fastapi import HTTPException
 from clean_sql_query import clean_sql_query
 from sql_prompt import sql_prompt
 from verify_sql_prompt import verify_sql_prompt
-from strip_think_tags import strip_think_tags
-from config import flight_llm, db, MAX_ATTEMPTS, logger
+from strip_think_tags import ThinkTagFilter
+from sql_tokenizer import iter_tokens
+from sql_cache import SQLCache
+from sql_templates import match_template
+from sql_validator import check_sql, reason_category, VALID, INVALID
+from db_pool import read_pool
+from schema_cache import schema_cache
+from metrics import STAGE_SECONDS, SQL_ATTEMPTS, SQL_REJECTIONS
+from config import (
+    get_stage_llm, get_engine, MAX_ATTEMPTS, logger,
+    SQL_CACHE_MAX_ENTRIES, SQL_CACHE_TTL_SECONDS, SQL_CACHE_SIMILARITY_THRESHOLD
+)
+
+sql_cache = SQLCache(
+    max_entries=SQL_CACHE_MAX_ENTRIES,
+    ttl=SQL_CACHE_TTL_SECONDS,
+    similarity_threshold=SQL_CACHE_SIMILARITY_THRESHOLD
+)
 
 async def get_table_info():
     """Get database schema information"""
     try:
-        return db.get_table_info()
+        return await schema_cache.get_table_info(await current_schema_version())
     except (SQLAlchemyError, SQLiteError) as e:
         raise HTTPException(
             status_code=500,
             detail=f"Error accessing database schema: {str(e)}"
         ) from e
 
+async def current_schema_version() -> int:
+    """SQLite's schema cookie, read on the read-only pool so it never blocks the event loop"""
+    result = await read_pool.execute("PRAGMA schema_version")
+    return result.rows[0][0]
+
+def sql_statement_complete(text: str) -> bool:
+    """Whether the text holds a finished SELECT: terminated by ';' or a closing code fence"""
+    in_statement = False
+    for kind, token in iter_tokens(text):
+        if kind == 'word' and token.upper() in ('SELECT', 'WITH'):
+            in_statement = True
+        elif in_statement and (token == ';' or kind == 'fence'):
+            return True
+    return False
+
+def verdict_complete(text: str) -> bool:
+    """Whether a verification answer is finished: VALID, or INVALID with its reason line"""
+    text = text.lstrip().upper()
+    if text.startswith("VALID"):
+        return True
+    first_line, newline, _ = text.partition('\n')
+    return text.startswith("INVALID") and bool(newline) and bool(first_line.partition(':')[2].strip())
+
+class TruncatedReasoningError(ValueError):
+    """The response ended inside <think>, usually at max_tokens, so it holds no answer"""
+
+async def stream_until(chunks: AsyncIterator, done: Callable[[str], bool]) -> str:
+    """
+    Collect a streamed LLM response without its <think> blocks, closing the stream
+    (and with it the generation) as soon as the visible text satisfies `done`.
+    Raises TruncatedReasoningError if the stream ends inside a <think> block.
+    """
+    think_filter = ThinkTagFilter()
+    visible = []
+    try:
+        async for chunk in chunks:
+            content = chunk if isinstance(chunk, str) else getattr(chunk, "content", str(chunk))
+            visible.append(think_filter.feed(content))
+            if not think_filter.in_think and done(''.join(visible)):
+                break
+    finally:
+        await chunks.aclose()
+    if think_filter.in_think:
+        raise TruncatedReasoningError("The model's reasoning was cut off before it answered")
+    visible.append(think_filter.flush())
+    return ''.join(visible)
+
 class LoggingSQLChain:
-    def __init__(self, chain, _db):
+    def __init__(self, chain, table_info, top_k):
         self.chain = chain
-        self.db = _db
+        self.table_info = table_info
+        self.top_k = top_k
 
     async def ainvoke(self, inputs):
-        # Get the actual table info from the database
-        table_info = self.db.get_table_info()
-
-        # Format the prompt with all variables
-        formatted_prompt = sql_prompt.format(
-            input=inputs["question"],
-            top_k=10,  # or whatever default you want
-            table_info=table_info
-        )
+        # Formatting the full prompt is only worth it when someone will read it
+        if logger.isEnabledFor(logging.INFO):
+            formatted_prompt = sql_prompt.format(
+                input=inputs["question"],
+                top_k=self.top_k,
+                table_info=self.table_info
+            )
 
-        # Log the fully formatted prompt
-        logger.info("\n=== RUNTIME SQL PROMPT ===\n")
-        logger.info(formatted_prompt)
-        logger.info("\n=== END RUNTIME SQL PROMPT ===\n")
+            # Log the fully formatted prompt
+            logger.info("\n=== RUNTIME SQL PROMPT ===\n")
+            logger.info(formatted_prompt)
+            logger.info("\n=== END RUNTIME SQL PROMPT ===\n")
 
-        return await self.chain.ainvoke(inputs)
+        return await stream_until(self.chain.astream(inputs), sql_statement_complete)
 
 async def verify_sql(question: str, sql_query: str) -> Tuple[bool, str]:
     # Generate natural language response
@@ -49,8 +112,9 @@ async def verify_sql(question: str, sql_query: str) -> Tuple[bool, str]:
         "sql_query": sql_query,
     }
     verification_prompt = verify_sql_prompt.format(**sql_verify_input)
-    verification_response = await flight_llm.ainvoke(verification_prompt)
-    response_text = strip_think_tags(verification_response).strip().upper()
+    with STAGE_SECONDS.time(stage="verify_sql"):
+        verification_response = await stream_until(get_stage_llm('verify').astream(verification_prompt), verdict_complete)
+    response_text = verification_response.strip().upper()
 
     if response_text.startswith("VALID"):
         return True, ""
@@ -62,25 +126,90 @@ async def verify_sql(question: str, sql_query: str) -> Tuple[bool, str]:
             reason = "Query does not correctly answer the question"
         return False, reason
 
-async def generate_sql(question: str, attempt: int = 1) -> str:
-    if attempt > MAX_ATTEMPTS:
-        raise ValueError(f"Failed to generate valid SQL query after {MAX_ATTEMPTS} attempts")
+def with_feedback(question: str, sql_query: str, reason: str) -> str:
+    """Append the rejected query and the reason it was rejected so the next attempt can fix it"""
+    return (
+        f"{question}\n\n"
+        f"A previous attempt generated this SQL query:\n{sql_query}\n"
+        f"It was rejected because: {reason}\n"
+        "Generate a corrected query that avoids this problem."
+    )
 
-    # Initialize SQL generation chain with logging wrapper
-    sql_chain = create_sql_query_chain(llm=flight_llm, db=db, prompt=sql_prompt)
-    logging_chain = LoggingSQLChain(sql_chain, db)
+async def generate_sql(question: str, schema_version=None) -> str:
+    """
+    Generate SQL and validate it locally, asking the LLM verifier only when the
+    static check is inconclusive. Each retry is told why the previous query failed.
+    """
+    # Reuse the cached SQL generation chain with logging wrapper
+    if schema_version is None:
+        schema_version = await current_schema_version()
+    sql_chain = await schema_cache.get_chain(schema_version)
+    logging_chain = LoggingSQLChain(sql_chain, schema_cache.table_info, schema_cache.top_k)
 
-    # Generate SQL query
-    sql_query_response = await logging_chain.ainvoke({"question": question})
-    sql_query = strip_think_tags(sql_query_response)
-    cleaned_query = clean_sql_query(sql_query)
+    prompt_question = question
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        # Generate SQL query
+        try:
+            with STAGE_SECONDS.time(stage="generate_sql_attempt"):
+                sql_query = await logging_chain.ainvoke({"question": prompt_question})
+        except TruncatedReasoningError as e:
+            logger.warning("SQL generation on attempt %d failed: %s", attempt, e)
+            SQL_REJECTIONS.inc(check="llm", reason="truncated_reasoning")
+            continue
+        cleaned_query = clean_sql_query(sql_query)
 
-    # Verify the query
-    is_valid, reason = await verify_sql(question, cleaned_query)
+        # Verify the query, locally first; its EXPLAIN is a blocking SQLite call
+        static_check = await asyncio.to_thread(
+            check_sql, question, cleaned_query, get_engine(), schema_cache.table_names
+        )
+        if static_check.status == VALID:
+            logger.info("Valid SQL query generated on attempt %d (static check)", attempt)
+            SQL_ATTEMPTS.observe(attempt, outcome="valid")
+            return cleaned_query
+
+        if static_check.status == INVALID:
+            is_valid, reason = False, static_check.reason
+            SQL_REJECTIONS.inc(check="static", reason=reason_category(reason))
+        else:
+            try:
+                is_valid, reason = await verify_sql(question, cleaned_query)
+            except TruncatedReasoningError as e:
+                logger.warning("SQL verification on attempt %d failed: %s", attempt, e)
+                SQL_REJECTIONS.inc(check="llm", reason="truncated_reasoning")
+                continue
+            if not is_valid:
+                SQL_REJECTIONS.inc(check="llm", reason="verifier")
+
+        if is_valid:
+            logger.info("Valid SQL query generated on attempt %d", attempt)
+            SQL_ATTEMPTS.observe(attempt, outcome="valid")
+            return cleaned_query
 
-    if is_valid:
-        logger.info("Valid SQL query generated on attempt %d", attempt)
-        return cleaned_query
-    else:
         logger.warning("Invalid SQL query on attempt %d. Reason: %s", attempt, reason)
-        return await generate_sql(question, attempt + 1)
\ No newline at end of file
+        prompt_question = with_feedback(question, cleaned_query, reason)
+
+    SQL_ATTEMPTS.observe(MAX_ATTEMPTS, outcome="failed")
+    raise ValueError(f"Failed to generate valid SQL query after {MAX_ATTEMPTS} attempts")
+
+async def get_verified_sql(question: str) -> Tuple[str, Dict[str, Any]]:
+    """
+    Return a SQL query and its bind parameters for the question.
+    Simple route/date/price questions are rendered from templates without the LLM,
+    provided the schema has the columns they read;
+    everything else is served from the cache or generated and verified on a miss.
+    """
+    schema_version = await current_schema_version()
+    await schema_cache.refresh_if_stale(schema_version)
+    template_match = match_template(question, schema_cache.columns)
+    if template_match is not None:
+        logger.info("SQL template matched question: %s", question)
+        return template_match
+
+    cached_query = sql_cache.get(question, schema_version)
+    if cached_query is not None:
+        logger.info("SQL cache hit for question: %s", question)
+        return cached_query, {}
+
+    cleaned_query = await generate_sql(question, schema_version)
+    sql_cache.put(question, cleaned_query, schema_version)
+    return cleaned_query, {}
\ No newline at end of file
@@ -1,4 +1,5 @@
 import os
+from typing import List, Optional
 from langchain_ollama import ChatOllama
 from langchain_groq import ChatGroq
 from langchain_openai.chat_models.base import BaseChatOpenAI
@@ -6,22 +7,37 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-def get_llm(model_name, platform_name="OLLAMA"):
+def get_llm(model_name, platform_name="OLLAMA", temperature: Optional[float] = None,
+            max_tokens: Optional[int] = None, stop: Optional[List[str]] = None,
+            max_retries: Optional[int] = None):
+    """
+    Build a chat model. temperature, max_tokens and stop override the platform
+    defaults, so each pipeline stage can use its own profile. max_retries sets the
+    client's own retries (0 when a caller such as the LLM gateway retries itself).
+    """
     if platform_name == "OLLAMA":
         return ChatOllama(
             model=model_name,
-            temperature=0.2,
+            temperature=0.2 if temperature is None else temperature,
+            num_predict=max_tokens,
+            stop=stop,
         )
     elif platform_name == "GROQ":
         return ChatGroq(
-            temperature=1,
+            temperature=1 if temperature is None else temperature,
             model=model_name,
-            groq_api_key=os.getenv("GROQ_API_KEY")
+            groq_api_key=os.getenv("GROQ_API_KEY"),
+            max_tokens=max_tokens,
+            stop=stop,
+            max_retries=2 if max_retries is None else max_retries,
         )
     elif platform_name == 'DEEPSEEK':
         return BaseChatOpenAI(
             model=model_name,
             openai_api_key=os.getenv("DEEPSEEK_API_KEY"),
             openai_api_base='https://api.deepseek.com',
-            max_tokens=1024
-        )
\ No newline at end of file
+            max_tokens=1024 if max_tokens is None else max_tokens,
+            temperature=temperature,
+            stop=stop,
+            max_retries=max_retries,
+        )
@@ -0,0 +1,236 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from langchain_core.runnables import Runnable
+from metrics import LLM_TOKENS
+
+logger = logging.getLogger(__name__)
+
+# Lower runs first: the streamed answer a user is reading beats work they are waiting on,
+# which beats background lookups
+PRIORITY_ANSWER = 0
+PRIORITY_INTERACTIVE = 1
+PRIORITY_BACKGROUND = 2
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+class LLMOverloadedError(Exception):
+    """A provider's queue is full, or it kept rejecting calls with 429s"""
+
+    def __init__(self, provider: str, queue_depth: int, message: Optional[str] = None):
+        self.provider = provider
+        self.queue_depth = queue_depth
+        super().__init__(message or f"{provider} is overloaded ({queue_depth} requests queued); please retry shortly")
+
+class TokenBucket:
+    """Refills `per_minute` units per minute; callers borrow ahead and wait off the debt"""
+
+    def __init__(self, per_minute: Optional[float]):
+        self.rate = per_minute / 60 if per_minute else None
+        self.capacity = per_minute or 0
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def reserve(self, amount: float = 1) -> float:
+        """Take `amount` now and return how many seconds to wait before using it"""
+        if self.rate is None:
+            return 0.0
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= min(amount, self.capacity)
+        return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+class ProviderGate:
+    """
+    Admission control for one provider: at most `max_concurrency` calls run, up to
+    `max_queue` more wait in priority order, and anything beyond that is rejected
+    immediately with the current queue depth. Admitted calls also draw from
+    request- and token-per-minute buckets, and give their slot up while they wait
+    for those to refill.
+    """
+
+    def __init__(self, name: str, max_concurrency: int = 4, max_queue: int = 32,
+                 requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.active = 0
+        self.queued = 0
+        self.rejected = 0
+        self.retries = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+
+    def _release(self) -> None:
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                # The slot passes straight to the waiter; `active` is unchanged
+                self.queued -= 1
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    async def _acquire(self, priority: int) -> None:
+        if self.active < self.max_concurrency and not self.queued:
+            self.active += 1
+            return
+        if self.queued >= self.max_queue:
+            self.rejected += 1
+            raise LLMOverloadedError(self.name, self.queued)
+
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), waiter))
+        self.queued += 1
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._release()
+            else:
+                self.queued -= 1
+            raise
+
+    @asynccontextmanager
+    async def admit(self, priority: int, estimated_tokens: int):
+        await self._acquire(priority)
+        held = True
+        try:
+            delay = max(self.requests.reserve(1), self.tokens.reserve(estimated_tokens))
+            if delay > 0:
+                # A throttled call must not keep interactive traffic out while it waits
+                self._release()
+                held = False
+                await asyncio.sleep(delay)
+                await self._acquire(priority)
+                held = True
+            yield
+        finally:
+            if held:
+                self._release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"active": self.active, "queued": self.queued, "rejected": self.rejected, "retries": self.retries}
+
+def _status_code(error: Exception) -> Optional[int]:
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+def _retry_after(error: Exception) -> Optional[float]:
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+class GatewayLLM(Runnable):
+    """
+    Chat model behind its provider's gate. Drop-in for the wrapped model in ainvoke,
+    astream and chains; 429s and 5xx responses are retried with jittered backoff
+    (only before a stream has produced anything), waiting outside the gate so the
+    slot serves other calls meanwhile. Prompt and completion tokens are counted per
+    model, from the provider's usage metadata where it reports it.
+    """
+
+    def __init__(self, llm, gate: ProviderGate, priority: int = PRIORITY_INTERACTIVE,
+                 max_tokens: Optional[int] = None, max_retries: int = 3, model: Optional[str] = None):
+        self.llm = llm
+        self.gate = gate
+        self.priority = priority
+        self.max_tokens = max_tokens or 1024
+        self.max_retries = max_retries
+        self.model = model or gate.name
+
+    def _estimate_tokens(self, input: Any) -> int:
+        # About four characters per token, plus the most the model may write back
+        return len(str(input)) // 4 + self.max_tokens
+
+    def _count_tokens(self, input: Any, usage: Optional[Dict[str, int]], completion_estimate: int) -> None:
+        if usage:
+            prompt, completion = usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+        else:
+            # No usage reported: the same four characters per token as _estimate_tokens
+            prompt, completion = len(str(input)) // 4, completion_estimate
+        LLM_TOKENS.inc(prompt, model=self.model, kind="prompt")
+        LLM_TOKENS.inc(completion, model=self.model, kind="completion")
+
+    async def _backoff(self, error: Exception, attempt: int) -> None:
+        status = _status_code(error)
+        if status not in RETRYABLE_STATUS or attempt == self.max_retries:
+            if status == 429:
+                raise LLMOverloadedError(self.gate.name, self.gate.queued) from error
+            raise error
+        self.gate.retries += 1
+        delay = _retry_after(error) or min(2 ** attempt, 20) * (0.5 + random.random())
+        logger.warning("%s returned %s, retrying in %.1fs", self.gate.name, status, delay)
+        await asyncio.sleep(delay)
+
+    def invoke(self, input, config=None, **kwargs):
+        # Synchronous calls are not used by the app and bypass the gate
+        return self.llm.invoke(input, config, **kwargs)
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self.gate.admit(self.priority, self._estimate_tokens(input)):
+                    result = await self.llm.ainvoke(input, config, **kwargs)
+            except Exception as e:
+                await self._backoff(e, attempt)
+                continue
+            content = getattr(result, "content", result)
+            self._count_tokens(input, getattr(result, "usage_metadata", None), len(str(content)) // 4)
+            return result
+
+    async def astream(self, input, config=None, **kwargs) -> AsyncIterator:
+        for attempt in range(self.max_retries + 1):
+            chunks = 0
+            usage: Dict[str, int] = {}
+            try:
+                async with self.gate.admit(self.priority, self._estimate_tokens(input)):
+                    try:
+                        async for chunk in self.llm.astream(input, config, **kwargs):
+                            chunks += 1
+                            for key, value in (getattr(chunk, "usage_metadata", None) or {}).items():
+                                if isinstance(value, int):
+                                    usage[key] = usage.get(key, 0) + value
+                            yield chunk
+                    finally:
+                        # Also counts streams closed early, e.g. once the SQL statement is complete;
+                        # without usage metadata a streamed chunk counts as a token
+                        if chunks:
+                            self._count_tokens(input, usage, chunks)
+                return
+            except Exception as e:
+                if chunks:
+                    raise
+                error = e
+            await self._backoff(error, attempt)
+
+_gates: Dict[str, ProviderGate] = {}
+
+def get_gateway_llm(model_name, platform_name="OLLAMA", priority: int = PRIORITY_INTERACTIVE,
+                    limits: Optional[Dict[str, Dict[str, Any]]] = None, max_retries: int = 3, **profile):
+    """
+    get_llm behind a gate shared by every model on the same platform. The client's own
+    retries are disabled, since the gateway retries (and they would multiply).
+    """
+    gate = _gates.get(platform_name)
+    if gate is None:
+        gate = _gates[platform_name] = ProviderGate(platform_name, **(limits or {}).get(platform_name, {}))
+    # Imported here: the provider SDKs are slow to import and only needed once a model is used
+    from llm import get_llm
+    llm = get_llm(model_name, platform_name, max_retries=0, **profile)
+    return GatewayLLM(llm, gate, priority, profile.get("max_tokens"), max_retries, model=model_name)
+
+def gateway_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: gate.stats() for name, gate in _gates.items()}
@@ -0,0 +1,130 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+# Words that never change what a luggage question asks; negations and quantities are kept
+_STOPWORDS = {'a', 'an', 'the', 'please', 'pls', 'me', 'tell', 'what', "what's", 'whats', 'is', 'are'}
+
+def normalize_luggage_query(query: str) -> str:
+    """Fold case, punctuation, whitespace and filler words, so only rephrasings of one question share an answer"""
+    words = re.sub(r"[^\w\s'-]", ' ', query.lower()).split()
+    return ' '.join(word for word in words if word not in _STOPWORDS)
+
+class PolicyVersions:
+    """Content hash of each policy file, recomputed only when its size or mtime changes"""
+
+    def __init__(self):
+        self._versions: Dict[str, Tuple[Tuple[int, int], str]] = {}
+
+    def get(self, path: str) -> Optional[str]:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = self._versions.get(path)
+        if cached and cached[0] == signature:
+            return cached[1]
+        with open(path, 'rb') as file:
+            version = hashlib.sha256(file.read()).hexdigest()[:16]
+        self._versions[path] = (signature, version)
+        return version
+
+class LuggageAnswerCache:
+    """
+    Persistent (SQLite) cache of luggage answers keyed on airline, normalized question and
+    policy version. Its methods block on SQLite, so async callers run them via asyncio.to_thread;
+    a lock serializes the threads on the shared connection. Answers expire after `ttl` seconds, the least recently used are evicted
+    beyond `max_entries`, and an airline's answers are dropped once its policy file changes.
+    """
+
+    def __init__(self, path: str, max_entries: int = 5000, ttl: float = 7 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._current_versions: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute('''CREATE TABLE IF NOT EXISTS luggage_answers (
+                                    airline TEXT,
+                                    query TEXT,
+                                    policy_version TEXT,
+                                    answer TEXT,
+                                    created_at REAL,
+                                    last_used REAL,
+                                    PRIMARY KEY (airline, query, policy_version)
+                                )''')
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_luggage_answers_last_used ON luggage_answers (last_used)")
+        return self._conn
+
+    def _purge_stale_versions(self, airline: str, policy_version: str) -> None:
+        if self._current_versions.get(airline) == policy_version:
+            return
+        self._connection().execute(
+            "DELETE FROM luggage_answers WHERE airline = ? AND policy_version != ?",
+            (airline, policy_version)
+        )
+        self._current_versions[airline] = policy_version
+
+    def get(self, airline: str, query: str, policy_version: str) -> Optional[str]:
+        with self._lock:
+            return self._get(airline, query, policy_version)
+
+    def put(self, airline: str, query: str, policy_version: str, answer: str) -> None:
+        with self._lock:
+            self._put(airline, query, policy_version, answer)
+
+    def _get(self, airline: str, query: str, policy_version: str) -> Optional[str]:
+        self._purge_stale_versions(airline, policy_version)
+        conn = self._connection()
+        key = (airline, normalize_luggage_query(query), policy_version)
+        row = conn.execute(
+            "SELECT answer, created_at FROM luggage_answers WHERE airline = ? AND query = ? AND policy_version = ?",
+            key
+        ).fetchone()
+
+        now = time.time()
+        if row is None or now - row[1] > self.ttl:
+            if row is not None:
+                conn.execute("DELETE FROM luggage_answers WHERE airline = ? AND query = ? AND policy_version = ?", key)
+            self.misses += 1
+            return None
+
+        conn.execute(
+            "UPDATE luggage_answers SET last_used = ? WHERE airline = ? AND query = ? AND policy_version = ?",
+            (now,) + key
+        )
+        self.hits += 1
+        return row[0]
+
+    def _put(self, airline: str, query: str, policy_version: str, answer: str) -> None:
+        self._purge_stale_versions(airline, policy_version)
+        conn = self._connection()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO luggage_answers VALUES (?, ?, ?, ?, ?, ?)",
+            (airline, normalize_luggage_query(query), policy_version, answer, now, now)
+        )
+        conn.execute(
+            '''DELETE FROM luggage_answers WHERE rowid IN (
+                   SELECT rowid FROM luggage_answers ORDER BY last_used DESC LIMIT -1 OFFSET ?
+               )''',
+            (self.max_entries,)
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
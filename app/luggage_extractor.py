@@ -1,5 +1,5 @@
 from typing import Optional
-from config import luggage_llm
+from config import get_stage_llm
 
 async def extract_luggage_query(user_query: str) -> Optional[str]:
     """
@@ -25,7 +25,7 @@ async def extract_luggage_query(user_query: str) -> Optional[str]:
     Return only the extracted question or "NONE", without any additional text or explanation.
     """
 
-    response = await luggage_llm.ainvoke(prompt)
+    response = await get_stage_llm('luggage').ainvoke(prompt)
     extracted = response.content.strip()
 
     return None if extracted == "NONE" else extracted
\ No newline at end of file
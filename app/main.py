@@ -1,11 +1,25 @@
+import asyncio
+import json
 import sqlite3
+import uuid
 from pathlib import Path
+from typing import Optional
 import uvicorn
 from fastapi import FastAPI, Query
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from sse_starlette.sse import EventSourceResponse
-from database import json_to_sqlite
-from query_chain import stream_response
+from database import json_to_sqlite, enable_wal, migrate_flights_table
+from query_chain import coalesced_stream_response, in_flight
+from generate_and_verify_sql import sql_cache
+from schema_cache import schema_cache
+from db_pool import read_pool
+from result_cache import result_cache
+from vector_db import policy_index, luggage_answer_cache
+from llm_gateway import gateway_stats
+from metrics import registry
+from readiness import Readiness, FAILED
+from config import get_stage_llm, TRACE_IDS
 
 # Initialize the FastAPI app
 app = FastAPI(title="Flight Query API")
@@ -23,20 +37,130 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+readiness = Readiness(required=("database", "schema"), optional=("embeddings", "luggage_model"))
+
+async def warming_up():
+    yield json.dumps({
+        "type": "error",
+        "code": "warming_up",
+        "content": "The service is still starting up. Please retry shortly."
+    })
+
+async def with_trace_id(events, trace_id: str):
+    # Added per subscriber: coalesced requests share events but keep their own trace ids
+    async for event in events:
+        yield json.dumps({**json.loads(event), "trace_id": trace_id})
+
 @app.get("/stream")
-async def stream_query(question: str = Query(...)):
+async def stream_query(question: str = Query(...), trace_id: Optional[str] = Query(None)):
+    events = coalesced_stream_response(question) if readiness.serving else warming_up()
+    headers = None
+    if trace_id or TRACE_IDS:
+        trace_id = trace_id or uuid.uuid4().hex
+        events = with_trace_id(events, trace_id)
+        headers = {"X-Trace-Id": trace_id}
     return EventSourceResponse(
-        stream_response(question),  # Remove 'events=' keyword
-        media_type="text/event-stream"
+        events,  # Remove 'events=' keyword
+        media_type="text/event-stream",
+        headers=headers
     )
 
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and its event loop is responsive"""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness per component; 503 until the pod should receive traffic"""
+    report = readiness.report()
+    return JSONResponse(report, status_code=200 if report["ready"] else 503)
+
+def cache_metrics():
+    """Cache, coalescing and LLM gateway counters, read when /metrics is scraped"""
+    caches = {
+        "sql": (sql_cache.hits + sql_cache.similar_hits, sql_cache.misses, len(sql_cache)),
+        "result": (result_cache.hits, result_cache.misses, len(result_cache)),
+        "schema": (schema_cache.hits, schema_cache.misses, None),
+        "luggage_answer": (luggage_answer_cache.hits, luggage_answer_cache.misses, None),
+    }
+    yield ("flight_cache_hits_total", "counter", "Cache hits by cache",
+           [({"cache": name}, hits) for name, (hits, _, _) in caches.items()])
+    yield ("flight_cache_misses_total", "counter", "Cache misses by cache",
+           [({"cache": name}, misses) for name, (_, misses, _) in caches.items()])
+    yield ("flight_cache_entries", "gauge", "Entries held by each in-memory cache",
+           [({"cache": name}, size) for name, (_, _, size) in caches.items() if size is not None])
+    yield ("flight_sql_cache_similar_hits_total", "counter", "SQL cache hits served by a similar question",
+           [({}, sql_cache.similar_hits)])
+    yield ("flight_result_cache_bytes", "gauge", "Bytes held by the query result cache",
+           [({}, result_cache.bytes)])
+    yield ("flight_coalesced_requests_total", "counter", "Requests that joined an identical in-flight response",
+           [({}, in_flight.coalesced)])
+    yield ("flight_in_flight_responses", "gauge", "Responses currently being generated",
+           [({}, len(in_flight))])
+    gates = gateway_stats()
+    for stat, kind, help in (("active", "gauge", "LLM calls running"),
+                             ("queued", "gauge", "LLM calls waiting for a slot"),
+                             ("rejected", "counter", "LLM calls rejected because the queue was full"),
+                             ("retries", "counter", "LLM calls retried after 429 or 5xx responses")):
+        name = f"flight_llm_{stat}" + ("_total" if kind == "counter" else "")
+        yield (name, kind, help, [({"provider": provider}, stats[stat]) for provider, stats in gates.items()])
+
+registry.register_collector(cache_metrics)
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 # Event handlers for startup and shutdown
-@app.on_event("startup")
-async def startup_event():
-    db_path = Path('./flights.db')
+def prepare_database(db_path):
+    """Load the flight data into an empty database, or migrate an existing one (blocking)"""
     # Check if database file exists and is empty
     if is_database_empty(db_path):
         json_to_sqlite('./data/flight_data.json', './flights.db')
+        schema_cache.invalidate()
+        result_cache.invalidate()
+    else:
+        migrate_flights_table(db_path)
+    enable_wal(db_path)
+
+async def warm_up():
+    """Bring every component up concurrently, recording each in `readiness`"""
+    db_path = Path('./flights.db')
+
+    async def database_and_schema():
+        # Ingestion is synchronous SQLite work, so it runs on a worker thread
+        if await readiness.track("database", asyncio.to_thread(prepare_database, db_path)):
+            # Reflect the schema and build the SQL chain once, before the first request
+            await readiness.track("schema", asyncio.to_thread(schema_cache.ensure_fresh))
+        else:
+            readiness.mark("schema", FAILED, "database unavailable")
+
+    async def embeddings():
+        await policy_index.load()
+        if not policy_index.loaded:
+            raise RuntimeError("policy embeddings unavailable, using keyword search")
+
+    async def luggage_model():
+        # The first call makes Ollama load the model into memory
+        await get_stage_llm('luggage').ainvoke("Reply with OK.")
+
+    await asyncio.gather(
+        database_and_schema(),
+        readiness.track("embeddings", embeddings()),
+        readiness.track("luggage_model", luggage_model()),
+    )
+
+@app.on_event("startup")
+async def startup_event():
+    # The server answers /healthz and /readyz while warming up
+    app.state.warm_up_task = asyncio.create_task(warm_up())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    app.state.warm_up_task.cancel()
+    read_pool.close()
 
 def is_database_empty(db_path):
     try:
@@ -1,48 +1,81 @@
-import re
 import json
+import time
 import asyncio
-from typing import AsyncGenerator
+from typing import Any, AsyncGenerator, Dict, Optional, Set
 from sqlite3 import Error as SQLiteError
 from sqlalchemy.exc import SQLAlchemyError
 from langchain_core.messages import AIMessage
-from query_validator import is_flight_related_query, is_luggage_related_query
+from query_validator import classify_query
 from luggage_extractor import extract_luggage_query
+from strip_think_tags import ThinkTagFilter, SentenceChunker
 from fastapi import HTTPException
 from response_prompt import response_prompt
-from generate_and_verify_sql import generate_sql
-from config import flight_llm, db, logger
-from vector_db import search_policy
-from util import parse_tuple_list
+from generate_and_verify_sql import get_verified_sql
+from sql_templates import inline_params
+from config import (
+    get_stage_llm, logger, LUGGAGE_CONCURRENCY,
+    ANSWER_FLUSH_MAX_LATENCY_SECONDS, ANSWER_FLUSH_MAX_CHARS
+)
+from db_pool import read_pool, QueryResult, QueryTimeoutError
+from result_cache import result_cache
+from vector_db import search_policy, policy_index
+from stages import StageGraph
+from llm_gateway import LLMOverloadedError
+from metrics import STAGE_SECONDS, TIME_TO_FIRST_ANSWER_SECONDS, SQL_ROWS, REQUESTS
+from single_flight import SingleFlight
+from sql_cache import normalize_question
+from util import rows_as_dicts, airlines_in_result, merge_streams
 from airlines import VALID_AIRLINES
 
+in_flight = SingleFlight()
+
+def coalesced_stream_response(question: str) -> AsyncGenerator[str, None]:
+    """stream_response, shared by every concurrent request for the same normalized question"""
+    return in_flight.stream(normalize_question(question), lambda: stream_response(question))
+
 async def stream_response(question: str) -> AsyncGenerator[str, None]:
+    graph = StageGraph()
+    outcome = "cancelled"
     try:
-        if not is_flight_related_query(question):
+        with STAGE_SECONDS.time(stage="classify"):
+            flags = classify_query(question)
+        if not flags.flight:
+            outcome = "not_flight"
             yield json.dumps({
                 "type": "error",
                 "content": "Query not related to flight data. Please ask about flights, prices, routes, or travel dates."
             })
             return
 
-        # Step 1: Generate and verify SQL query
-        cleaned_query = await generate_sql(question)
-
-        # Step 2: Stream SQL query in chunks
-        sql_chunks = [cleaned_query[i:i+10] for i in range(0, len(cleaned_query), 10)]
-        for chunk in sql_chunks:
-            yield json.dumps({
-                "type": "sql",
-                "content": chunk
-            })
-            await asyncio.sleep(0.05)
-
-        # Step 3: Execute SQL query
-        query_results_str = await execute_query(cleaned_query)
-
-        # Step 4: Parse query results
-        flight_data = parse_tuple_list(query_results_str)
+        # Step 1: Start every stage that only needs the question. SQL comes from a template,
+        # the cache, or the (slow) generate-and-verify loop; luggage extraction on the local
+        # model and loading the policy index run alongside it.
+        sql_stage = graph.add("sql", lambda: get_verified_sql(question))
+        luggage_task = None
+        if flags.luggage:
+            luggage_task = graph.add("luggage_extraction", lambda: extract_luggage_query(question))
+            # Shielded: the index is shared, so a finished request must not abort its load
+            graph.add("policy_warmup", lambda: asyncio.shield(policy_index.load()))
+
+        # Step 2: Execute the SQL as soon as it is ready, while it is sent to the client
+        # as one event (clients that want a typing effect can pace its display themselves)
+        query_stage = graph.add("execute_query", lambda sql: execute_query(*sql), "sql")
+        cleaned_query, query_params = await sql_stage
+        # Template queries are executed with bind parameters but shown with their values
+        display_query = inline_params(cleaned_query, query_params)
+        yield json.dumps({
+            "type": "sql",
+            "content": display_query
+        })
+
+        # Step 3: Wait for the SQL query results
+        query_result = await query_stage
+
+        # Step 4: Key result rows by column name
+        flight_data = rows_as_dicts(query_result)
 
         if not flight_data:
+            outcome = "no_results"
             yield json.dumps({
                 "type": "error",
                 "content": "No flights found for the given route."
@@ -50,74 +83,152 @@ async def stream_response(question: str) -> AsyncGenerator[str, None]:
             return
 
         # Step 5: Extract valid airline names
-        airline_names = {flight[1] for flight in flight_data if flight[1] in VALID_AIRLINES}
-
-        # Step 6: Handle luggage-related queries
-        luggage_policies = {}
-        if is_luggage_related_query(question):
-            luggage_query = await extract_luggage_query(question)
-            if luggage_query:
-                for airline in airline_names:
-                    policy = await search_policy(airline, luggage_query)
-                    luggage_policies[airline] = f"{policy} ({airline})"
-
-        # Step 7: Generate response using streaming
+        airline_names = airlines_in_result(query_result, VALID_AIRLINES)
+
+        # Step 6: Generate response using streaming; luggage policies are sent as
+        # separate events as each lookup finishes, so they never gate the answer
         response_input = {
             "question": question,
-            "sql_query": cleaned_query,
+            "sql_query": display_query,
             "query_result": flight_data,
-            "luggage_policies": luggage_policies
+            "luggage_policies": {}
         }
         formatted_response_prompt = response_prompt.format(**response_input)
-
-        buffer = ""
-        current_think = False
-
-        # Step 8: Stream AI-generated response
-        async for chunk in flight_llm.astream(formatted_response_prompt):
-            if isinstance(chunk, AIMessage):
-                content = chunk.content
-            else:
-                content = str(chunk)
-
-            if "<think>" in content:
-                current_think = True
-                continue
-            elif "</think>" in content:
-                current_think = False
-                continue
-
-            if current_think:
-                continue
-
-            buffer += content
-
-            if re.search(r'[.,!?\s]$', buffer):
-                if buffer.strip():
-                    yield json.dumps({"type": "answer", "content": buffer})
-                buffer = ""
-
-        # Step 9: Append luggage policy at the end
-        if luggage_policies:
-            luggage_info = "\n\nLuggage Policies:\n" + "\n".join(
-                [f"- {policy}" for policy in luggage_policies.values()]
-            )
-            yield json.dumps({"type": "answer", "content": luggage_info})
-
-        # Send any remaining buffered content
-        if buffer.strip():
-            yield json.dumps({"type": "answer", "content": buffer})
-
+        streams = [stream_answer(formatted_response_prompt, graph.created_at)]
+
+        # Step 7: Look up luggage policies for every airline concurrently
+        if luggage_task and airline_names:
+            streams.append(stream_luggage_policies(airline_names, luggage_task))
+
+        # Step 8: Stream the answer interleaved with luggage policies as they arrive
+        async for event in merge_streams(*streams):
+            yield event
+        outcome = "answered"
+
+    except LLMOverloadedError as e:
+        outcome = "overloaded"
+        logger.warning("Rejected under load: %s", str(e))
+        yield json.dumps({
+            "type": "error",
+            "code": "overloaded",
+            "content": str(e),
+            "provider": e.provider,
+            "queue_depth": e.queue_depth
+        })
     except Exception as e:
+        outcome = "error"
         logger.error("Error in stream_response: %s", str(e))
         yield json.dumps({"type": "error", "content": str(e)})
-
-async def execute_query(query: str):
-    """Execute SQL query and return results"""
+    finally:
+        # Nothing outlives the response, e.g. after a client disconnect or an early return
+        graph.cancel()
+        for name, timing in graph.timings.items():
+            STAGE_SECONDS.observe(timing.duration, stage=name)
+        REQUESTS.inc(outcome=outcome)
+        logger.info("Stage timings for %r: %s", question, graph.format_timings())
+
+async def execute_query(query: str, params: Optional[Dict[str, Any]] = None) -> QueryResult:
+    """Execute SQL query on the read-only pool and return typed rows, reusing cached results"""
+    await result_cache.refresh_version()
+    cached = result_cache.get(query, params)
+    if cached is not None:
+        SQL_ROWS.observe(len(cached.rows))
+        return cached
+    data_version = result_cache.data_version
     try:
-        return db.run(query)
+        # Timed as the execute_query stage of the request's StageGraph
+        result = await read_pool.execute(query, params)
+    except QueryTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e)) from e
     except (SQLAlchemyError, SQLiteError) as e:
         raise HTTPException(
             status_code=500,
             detail=f"SQL execution error: {str(e)}"
-        ) from e
\ No newline at end of file
+        ) from e
+    SQL_ROWS.observe(len(result.rows))
+    result_cache.put(query, params, result, data_version)
+    return result
+
+async def stream_answer(formatted_response_prompt: str,
+                        request_started: Optional[float] = None) -> AsyncGenerator[str, None]:
+    """
+    Stream the answer LLM's output as answer events, dropping <think> blocks.
+    `request_started` (a perf_counter value) is used to measure time to the first answer.
+    """
+    started = time.perf_counter()
+    first_answer = True
+    think_filter = ThinkTagFilter()
+    chunker = SentenceChunker(ANSWER_FLUSH_MAX_LATENCY_SECONDS, ANSWER_FLUSH_MAX_CHARS)
+
+    async for chunk in get_stage_llm('answer').astream(formatted_response_prompt):
+        if isinstance(chunk, AIMessage):
+            content = chunk.content
+        else:
+            content = str(chunk)
+
+        text = chunker.feed(think_filter.feed(content))
+        if text and text.strip():
+            if first_answer:
+                first_answer = False
+                TIME_TO_FIRST_ANSWER_SECONDS.observe(time.perf_counter() - (request_started or started))
+            yield json.dumps({"type": "answer", "content": text})
+
+    # Send any remaining buffered content; feeding the held-back tail may itself flush
+    text = (chunker.feed(think_filter.flush()) or "") + chunker.flush()
+    if text.strip():
+        if first_answer:
+            TIME_TO_FIRST_ANSWER_SECONDS.observe(time.perf_counter() - (request_started or started))
+        yield json.dumps({"type": "answer", "content": text})
+    STAGE_SECONDS.observe(time.perf_counter() - started, stage="answer")
+
+def luggage_error(airline: str, error: Exception) -> str:
+    logger.error("Luggage policy lookup for %s failed: %s", airline, str(error))
+    return json.dumps({
+        "type": "luggage",
+        "airline": airline,
+        "error": "Luggage policy is unavailable right now."
+    })
+
+async def stream_luggage_policies(airlines: Set[str],
+                                  luggage_task: "asyncio.Task[Optional[str]]") -> AsyncGenerator[str, None]:
+    """
+    Look up each airline's policy with bounded concurrency and yield each as soon as it is
+    ready. A failed lookup is yielded as an error item for that airline instead of failing
+    the response, which is streamed alongside.
+    """
+    try:
+        luggage_query = await luggage_task
+    except Exception as e:
+        for airline in sorted(airlines):
+            yield luggage_error(airline, e)
+        return
+    finally:
+        luggage_task.cancel()
+    if not luggage_query:
+        return
+
+    semaphore = asyncio.Semaphore(LUGGAGE_CONCURRENCY)
+
+    async def lookup(airline: str):
+        async with semaphore:
+            try:
+                with STAGE_SECONDS.time(stage="luggage_retrieval"):
+                    return airline, await search_policy(airline, luggage_query)
+            except Exception as e:
+                return airline, e
+
+    tasks = [asyncio.create_task(lookup(airline)) for airline in sorted(airlines)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            airline, policy = await next_done
+            if isinstance(policy, Exception):
+                yield luggage_error(airline, policy)
+                continue
+            yield json.dumps({
+                "type": "luggage",
+                "airline": airline,
+                "content": f"{policy} ({airline})"
+            })
+    finally:
+        for task in tasks:
+            task.cancel()
\ No newline at end of file
@@ -0,0 +1,178 @@
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Set, Tuple
+
+FLIGHT = "flight"
+LUGGAGE = "luggage"
+
+# Core flight-related keywords
+FLIGHT_KEYWORDS = frozenset({
+    'flight', 'air', 'airline', 'airport', 'airways',
+    'travel', 'trip', 'journey',
+    'destination', 'dest',
+    'origin', 'route', 'path', 'connection',
+    'price', 'fare', 'cost', 'expensive', 'cheap',
+    'direct', 'nonstop', 'connecting',
+    'departure', 'arrive', 'arriving', 'departing',
+    'domestic', 'international'
+})
+
+# Location indicators that strongly suggest a flight query; matched exactly
+LOCATION_INDICATORS = frozenset({'from', 'to', 'between', 'via'})
+
+CURRENCY_SYMBOLS = ('₹', '$', '€')
+
+# Core luggage-related keywords; multi-word entries match as phrases
+LUGGAGE_KEYWORDS = frozenset({
+    'luggage', 'baggage', 'bag', 'suitcase', 'carry-on',
+    'carry on', 'check-in', 'checked bag', 'hand baggage',
+    'weight', 'kg', 'kilos', 'pounds', 'lbs',
+    'dimensions', 'size', 'allowance', 'restriction',
+    'prohibited', 'forbidden', 'allowed', 'limit',
+    'overweight', 'excess', 'cabin', 'hold', 'storage',
+    'pack', 'bring', 'carry', 'transport', 'stow'
+})
+
+_WORD = re.compile(r"\w+")
+
+class QueryFlags(NamedTuple):
+    flight: bool
+    luggage: bool
+
+def max_typos(word: str) -> int:
+    """Edits tolerated for a keyword, roughly difflib's 0.75 similarity cutoff"""
+    if len(word) <= 3:
+        return 0
+    return 1 if len(word) <= 7 else 2
+
+def _deletes(word: str, distance: int) -> Set[str]:
+    variants = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        variants |= frontier
+    return variants
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance (adjacent swaps count once), or limit + 1 beyond it"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        for j, cb in enumerate(b, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+class KeywordIndex:
+    """
+    Typo-tolerant keyword lookup built once: a symspell-style dictionary maps every
+    deletion variant of each vocabulary word back to that word, so correcting a query
+    word is a few dict lookups plus edit-distance checks on the handful of candidates.
+    Multi-word keywords are matched as n-grams of corrected words, and also in their
+    joined form ("carryon").
+    """
+
+    def __init__(self, keywords: Dict[str, Iterable[str]], exact: Dict[str, Iterable[str]] = None):
+        self.words: Dict[str, Set[str]] = {}
+        self.phrases: Dict[Tuple[str, ...], Set[str]] = {}
+        vocabulary: Set[str] = set()
+
+        for label, entries in keywords.items():
+            for entry in entries:
+                parts = tuple(_WORD.findall(entry.lower()))
+                if len(parts) == 1:
+                    self.words.setdefault(parts[0], set()).add(label)
+                else:
+                    self.phrases.setdefault(parts, set()).add(label)
+                    self.words.setdefault(''.join(parts), set()).add(label)
+                vocabulary.update(parts)
+                vocabulary.add(''.join(parts))
+
+        self.exact: Dict[str, Set[str]] = {}
+        for label, entries in (exact or {}).items():
+            for entry in entries:
+                self.exact.setdefault(entry, set()).add(label)
+
+        self.max_ngram = max((len(parts) for parts in self.phrases), default=1)
+        self.deletes: Dict[str, Set[str]] = {}
+        for word in vocabulary:
+            for variant in _deletes(word, max_typos(word)):
+                self.deletes.setdefault(variant, set()).add(word)
+        self.correct = lru_cache(maxsize=4096)(self._correct)
+
+    def _correct(self, token: str) -> str:
+        """The closest vocabulary word within its typo budget, or the token itself"""
+        if token in self.deletes and token in self.deletes[token]:
+            return token
+        best, best_distance = token, None
+        for variant in _deletes(token, 2):
+            for candidate in self.deletes.get(variant, ()):
+                limit = max_typos(candidate)
+                distance = edit_distance(token, candidate, limit)
+                if distance <= limit and (best_distance is None or (distance, candidate) < (best_distance, best)):
+                    best, best_distance = candidate, distance
+        return best
+
+    def labels(self, text: str) -> FrozenSet[str]:
+        tokens = _WORD.findall(text.lower())
+        found: Set[str] = set()
+        corrected: List[str] = []
+        for token in tokens:
+            found |= self.exact.get(token, set())
+            word = self.correct(token)
+            corrected.append(word)
+            found |= self.words.get(word, set())
+        for n in range(2, self.max_ngram + 1):
+            for i in range(len(corrected) - n + 1):
+                found |= self.phrases.get(tuple(corrected[i:i + n]), set())
+        return frozenset(found)
+
+keyword_index = KeywordIndex(
+    {FLIGHT: FLIGHT_KEYWORDS, LUGGAGE: LUGGAGE_KEYWORDS},
+    exact={FLIGHT: LOCATION_INDICATORS}
+)
+
+def classify_query(query: str) -> QueryFlags:
+    """Whether a query is about flights and whether it is about luggage, in one pass"""
+    labels = keyword_index.labels(query)
+    flight = FLIGHT in labels or any(symbol in query for symbol in CURRENCY_SYMBOLS)
+    return QueryFlags(flight=flight, luggage=LUGGAGE in labels)
+
+def is_flight_related_query(query: str) -> bool:
+    return classify_query(query).flight
+
+def is_luggage_related_query(query: str) -> bool:
+    return classify_query(query).luggage
+
+if __name__ == "__main__":
+    # Micro-benchmark: python query_validator.py
+    import timeit
+
+    samples = [
+        "cheapest flihgt from Mumbai to Delhi next friday",
+        "What is the carry on allowance for IndiGo?",
+        "how much does an overwieght bag cost",
+        "direct flights bangalore chennai",
+        "tell me a joke about cats",
+        "Can I bring a power bank in my checked bag on VietJet?",
+    ]
+    for sample in samples:
+        print(f"{classify_query(sample)}  {sample}")
+
+    runs = 20000
+    warm = timeit.timeit(lambda: [classify_query(s) for s in samples], number=runs // len(samples))
+    print(f"warm: {warm / runs * 1e6:.1f} µs/query")
+
+    def cold():
+        keyword_index.correct.cache_clear()
+        for s in samples:
+            classify_query(s)
+    cold_time = timeit.timeit(cold, number=200)
+    print(f"cold (no word cache): {cold_time / (200 * len(samples)) * 1e6:.1f} µs/query")
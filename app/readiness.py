@@ -0,0 +1,49 @@
+import time
+from typing import Any, Awaitable, Dict, Iterable, Optional
+
+PENDING = "pending"
+READY = "ready"
+FAILED = "failed"
+
+class Readiness:
+    """
+    Startup state of each component. Requests can be served once every required
+    component is ready; the process reports ready once, in addition, every optional
+    component has finished warming up, whether or not it succeeded (the app degrades
+    without them, e.g. keyword search instead of embeddings).
+    """
+
+    def __init__(self, required: Iterable[str], optional: Iterable[str] = ()):
+        self.required = tuple(required)
+        self.optional = tuple(optional)
+        self.started_at = time.monotonic()
+        self.components: Dict[str, Dict[str, Any]] = {
+            name: {"status": PENDING} for name in self.required + self.optional
+        }
+
+    def mark(self, name: str, status: str, detail: Optional[str] = None) -> None:
+        component = {"status": status, "seconds": round(time.monotonic() - self.started_at, 3)}
+        if detail:
+            component["detail"] = detail
+        self.components[name] = component
+
+    async def track(self, name: str, step: Awaitable[Any]) -> bool:
+        """Run a warm-up step and record its outcome; failures are recorded, not raised"""
+        try:
+            await step
+        except Exception as e:
+            self.mark(name, FAILED, str(e))
+            return False
+        self.mark(name, READY)
+        return True
+
+    @property
+    def serving(self) -> bool:
+        return all(self.components[name]["status"] == READY for name in self.required)
+
+    @property
+    def ready(self) -> bool:
+        return self.serving and all(self.components[name]["status"] != PENDING for name in self.optional)
+
+    def report(self) -> Dict[str, Any]:
+        return {"ready": self.ready, "serving": self.serving, "components": self.components}
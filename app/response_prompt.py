@@ -1,74 +1,23 @@
-
-from difflib import get_close_matches
-from typing import Set
-
-def get_fuzzy_matches(word: str, vocabulary: Set[str], cutoff: float = 0.75) -> bool:
-    """
-    Check if a word closely matches any word in the vocabulary using fuzzy matching
-    """
-    return bool(get_close_matches(word, vocabulary, n=1, cutoff=cutoff))
-
-def is_flight_related_query(query: str) -> bool:
-    """
-    Enhanced check for flight-related queries using fuzzy matching for typo tolerance
-    """
-    # Core flight-related keywords
-    flight_keywords = {
-        'flight', 'air', 'airline', 'airport', 'airways',
-        'travel', 'trip', 'journey',
-        'destination', 'dest',
-        'origin', 'route', 'path', 'connection',
-        'price', 'fare', 'cost', 'expensive', 'cheap',
-        'direct', 'nonstop', 'connecting',
-        'departure', 'arrive', 'arriving', 'departing',
-        'domestic', 'international'
-    }
-
-    # Location indicators that strongly suggest a flight query
-    location_indicators = {'from', 'to', 'between', 'via'}
-
-    # Clean and tokenize the query
-    query = query.lower().strip()
-    query_words = query.split()
-
-    # Check each word in the query for fuzzy matches
-    for word in query_words:
-        # Exact match for location indicators
-        if word in location_indicators:
-            return True
-
-        # Fuzzy match for flight keywords
-        if get_fuzzy_matches(word, flight_keywords):
-            return True
-
-    # Check for price indicators
-    if any(char in query for char in ['₹', '$', '€']):
-        return True
-
-    return False
-
-def is_luggage_related_query(query: str) -> bool:
-    """
-    Check if a query is related to luggage/baggage using fuzzy matching
-    """
-    # Core luggage-related keywords
-    luggage_keywords = {
-        'luggage', 'baggage', 'bag', 'suitcase', 'carry-on',
-        'carry on', 'check-in', 'checked bag', 'hand baggage',
-        'weight', 'kg', 'kilos', 'pounds', 'lbs',
-        'dimensions', 'size', 'allowance', 'restriction',
-        'prohibited', 'forbidden', 'allowed', 'limit',
-        'overweight', 'excess', 'cabin', 'hold', 'storage',
-        'pack', 'bring', 'carry', 'transport', 'stow'
-    }
-
-    # Clean and tokenize the query
-    query = query.lower().strip()
-    query_words = query.split()
-
-    # Check each word in the query for fuzzy matches
-    for word in query_words:
-        if get_fuzzy_matches(word, luggage_keywords):
-            return True
-
-    return False
\ No newline at end of file
+from langchain.prompts import PromptTemplate
+
+response_prompt = PromptTemplate(
+    input_variables=["question", "sql_query", "query_result", "luggage_policies"],
+    template="""
+Answer the user's flight question using only the query results below.
+
+User Question: {question}
+SQL Query: {sql_query}
+Query Results: {query_result}
+Luggage Policies: {luggage_policies}
+
+Response Rules:
+1. Answer the question directly, starting with the flights that best match it
+2. For each flight mention the airline, date, departure time, duration, stops and price in INR
+3. Keep the order of the query results; they are already sorted as the question asked
+4. Use only the data shown above; never invent flights, prices or times
+5. Luggage policies are sent to the user separately; only mention them if any are listed above
+6. Do not describe the SQL query or these instructions
+
+Response:
+"""
+)
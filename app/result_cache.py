@@ -0,0 +1,118 @@
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+from clean_sql_query import sql_fingerprint
+from db_pool import QueryResult, read_pool
+from config import RESULT_CACHE_MAX_BYTES, RESULT_CACHE_MAX_ENTRY_BYTES, DATA_VERSION_CHECK_SECONDS
+
+def result_size(result: QueryResult) -> int:
+    """Approximate memory held by a result's rows and values"""
+    size = sys.getsizeof(result.rows)
+    for row in result.rows:
+        size += sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row)
+    return size
+
+class ResultCache:
+    """
+    In-memory query results keyed on the SQL fingerprint, the bound parameters and
+    the data version. Least recently used results are evicted once their total size
+    passes `max_bytes`; results larger than `max_entry_bytes` are never stored. The
+    data version is re-read by refresh_version (awaited before lookups, so the read
+    never blocks the event loop) at most every `version_check_interval` seconds, and
+    a new version drops every cached result.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_entry_bytes: int = 4 * 1024 * 1024,
+                 version_source: Optional[Callable[[], Awaitable[Any]]] = None,
+                 version_check_interval: float = 5.0):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.version_source = version_source
+        self.version_check_interval = version_check_interval
+        self.data_version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes = 0
+        self._checked_at: Optional[float] = None
+        self._entries: "OrderedDict[Tuple[Hashable, ...], Tuple[QueryResult, int]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def refresh_version(self) -> None:
+        """Re-read the data version if the check interval has passed, dropping results on a change"""
+        if self.version_source is None:
+            return
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.version_check_interval:
+            return
+        # Set before awaiting so concurrent requests do not all re-read it
+        self._checked_at = now
+        version = await self.version_source()
+        if version != self.data_version:
+            self.clear()
+            self.data_version = version
+
+    def _key(self, sql: str, params: Optional[Dict[str, Any]]) -> Tuple[Hashable, ...]:
+        return (sql_fingerprint(sql), tuple(sorted((params or {}).items())), self.data_version)
+
+    def get(self, sql: str, params: Optional[Dict[str, Any]] = None) -> Optional[QueryResult]:
+        key = self._key(sql, params)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, sql: str, params: Optional[Dict[str, Any]], result: QueryResult,
+            data_version=None) -> None:
+        """Store a result; `data_version` is the version seen before the query ran, if known"""
+        key = self._key(sql, params)
+        # Data reloaded while the query ran: the result may mix old and new rows
+        if data_version is not None and data_version != key[-1]:
+            return
+        size = result_size(result)
+        if size > self.max_entry_bytes:
+            return
+        if key in self._entries:
+            self.bytes -= self._entries.pop(key)[1]
+        self._entries[key] = (result, size)
+        self.bytes += size
+        while self.bytes > self.max_bytes and self._entries:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.bytes -= evicted_size
+            self.evictions += 1
+
+    def invalidate(self) -> None:
+        """Re-read the data version on the next refresh_version, e.g. right after json_to_sqlite"""
+        self._checked_at = None
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "data_version": self.data_version,
+        }
+
+async def read_data_version() -> int:
+    """The data version json_to_sqlite bumps (in PRAGMA user_version), read on the read-only pool"""
+    result = await read_pool.execute("PRAGMA user_version")
+    return result.rows[0][0]
+
+result_cache = ResultCache(
+    max_bytes=RESULT_CACHE_MAX_BYTES,
+    max_entry_bytes=RESULT_CACHE_MAX_ENTRY_BYTES,
+    version_source=read_data_version,
+    version_check_interval=DATA_VERSION_CHECK_SECONDS
+)
@@ -0,0 +1,37 @@
+# Routes served by the flights table (see sql_prompt); each is bookable both ways
+ROUTE_PAIRS = [
+    ("New Delhi", "Phu Quoc"),
+    ("New Delhi", "Da Nang"),
+    ("New Delhi", "Hanoi"),
+    ("New Delhi", "Ho Chi Minh City"),
+    ("Mumbai", "Phu Quoc"),
+    ("Mumbai", "Da Nang"),
+    ("Mumbai", "Hanoi"),
+    ("Mumbai", "Ho Chi Minh City"),
+]
+
+ALLOWED_ROUTES = set(ROUTE_PAIRS) | {(dest, origin) for origin, dest in ROUTE_PAIRS}
+
+CITIES = {city for route in ROUTE_PAIRS for city in route}
+
+# Informal spellings and airport codes users type, mapped to the canonical city name
+CITY_ALIASES = {
+    "new delhi": "New Delhi",
+    "delhi": "New Delhi",
+    "del": "New Delhi",
+    "mumbai": "Mumbai",
+    "bombay": "Mumbai",
+    "bom": "Mumbai",
+    "phu quoc": "Phu Quoc",
+    "phuquoc": "Phu Quoc",
+    "pqc": "Phu Quoc",
+    "da nang": "Da Nang",
+    "danang": "Da Nang",
+    "hanoi": "Hanoi",
+    "ha noi": "Hanoi",
+    "ho chi minh city": "Ho Chi Minh City",
+    "ho chi minh": "Ho Chi Minh City",
+    "hcmc": "Ho Chi Minh City",
+    "saigon": "Ho Chi Minh City",
+    "sgn": "Ho Chi Minh City",
+}
@@ -0,0 +1,101 @@
+import asyncio
+from typing import Dict, List, Optional, Set
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableLambda
+from sql_prompt import sql_prompt
+from database import get_schema_version
+from config import get_stage_llm, get_engine, DB_PATH, SQL_TOP_K, logger
+
+class SchemaCache:
+    """
+    Process-wide cache of the reflected schema text and the SQL generation chain.
+    Both are rebuilt only when SQLite's schema version changes or after invalidate(),
+    so requests never pay for SQLAlchemy reflection or sample-row queries; when they
+    must, refresh_if_stale reflects on a worker thread instead of the event loop.
+    """
+
+    def __init__(self, _engine=None, llm=None, top_k: int = SQL_TOP_K):
+        # Either may be left out and is then fetched from config on first refresh
+        self.engine = _engine
+        self.llm = llm
+        self.top_k = top_k
+        self.hits = 0
+        self.misses = 0
+        self.schema_version = None
+        self.db = None
+        self.table_info = ""
+        self.table_names: List[str] = []
+        self.columns: Dict[str, Set[str]] = {}
+        self.chain = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _build_chain(self):
+        # Equivalent to create_sql_query_chain, with the schema text bound once
+        return (
+            RunnableLambda(lambda x: {"input": x["question"] + "\nSQLQuery: "})
+            | sql_prompt.partial(table_info=self.table_info, top_k=str(self.top_k))
+            | self.llm.bind(stop=["\nSQLResult:"])
+            | StrOutputParser()
+        )
+
+    def refresh(self, schema_version=None) -> None:
+        """Reflect the schema and rebuild the chain (blocking)"""
+        # Imported here: langchain_community is slow to import and only needed to reflect
+        from langchain_community.utilities import SQLDatabase
+        from sqlalchemy import inspect
+        if self.engine is None:
+            self.engine = get_engine()
+        if self.llm is None:
+            self.llm = get_stage_llm('sql')
+        self.db = SQLDatabase(self.engine)
+        self.table_info = self.db.get_table_info()
+        self.table_names = list(self.db.get_usable_table_names())
+        inspector = inspect(self.engine)
+        self.columns = {
+            table: {column['name'] for column in inspector.get_columns(table)}
+            for table in self.table_names
+        }
+        self.chain = self._build_chain()
+        self.schema_version = schema_version if schema_version is not None else get_schema_version(DB_PATH)
+        logger.info("Schema cache refreshed at schema version %s", self.schema_version)
+
+    def is_fresh(self, schema_version) -> bool:
+        return self.chain is not None and schema_version == self.schema_version
+
+    def ensure_fresh(self, schema_version=None) -> None:
+        """Blocking variant of refresh_if_stale, for startup and worker threads"""
+        if schema_version is None:
+            schema_version = get_schema_version(DB_PATH)
+        if self.is_fresh(schema_version):
+            self.hits += 1
+            return
+        self.misses += 1
+        self.refresh(schema_version)
+
+    async def refresh_if_stale(self, schema_version) -> None:
+        """Rebuild on a worker thread if the schema changed; concurrent callers share one rebuild"""
+        if self.is_fresh(schema_version):
+            self.hits += 1
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if self.is_fresh(schema_version):
+                self.hits += 1
+                return
+            self.misses += 1
+            await asyncio.to_thread(self.refresh, schema_version)
+
+    def invalidate(self) -> None:
+        """Force a rebuild on next use, e.g. after json_to_sqlite reloads data"""
+        self.chain = None
+
+    async def get_chain(self, schema_version):
+        await self.refresh_if_stale(schema_version)
+        return self.chain
+
+    async def get_table_info(self, schema_version) -> str:
+        await self.refresh_if_stale(schema_version)
+        return self.table_info
+
+schema_cache = SchemaCache()
@@ -0,0 +1,93 @@
+import asyncio
+from typing import AsyncIterator, Callable, Dict, List, Optional
+from config import logger
+
+class Flight:
+    """
+    Events of one in-flight response. The leader appends; every subscriber reads the
+    buffer at its own position, so a late joiner replays what it missed and then
+    follows live, and a slow subscriber never holds up the leader or the others.
+    """
+
+    def __init__(self):
+        self.events: List[str] = []
+        self.done = False
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.get_running_loop().create_future()
+
+    def _notify(self) -> None:
+        changed, self._changed = self._changed, asyncio.get_running_loop().create_future()
+        changed.set_result(None)
+
+    def publish(self, event: str) -> None:
+        self.events.append(event)
+        self._notify()
+
+    def close(self) -> None:
+        self.done = True
+        self._notify()
+
+    async def replay(self) -> AsyncIterator[str]:
+        position = 0
+        while True:
+            while position < len(self.events):
+                yield self.events[position]
+                position += 1
+            if self.done:
+                return
+            # Shielded: a disconnecting subscriber must not cancel the shared future
+            await asyncio.shield(self._changed)
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent requests: the first caller for a key starts the
+    work in a detached leader task, and callers arriving while it runs subscribe to
+    the same event sequence. The work is cancelled once every subscriber has left.
+    """
+
+    def __init__(self):
+        self.leaders = 0
+        self.coalesced = 0
+        self._flights: Dict[str, Flight] = {}
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    def _forget(self, key: str, flight: Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    async def _lead(self, key: str, flight: Flight, factory: Callable[[], AsyncIterator[str]]) -> None:
+        events = factory()
+        try:
+            async for event in events:
+                flight.publish(event)
+        except Exception as e:
+            # Subscribers just see the stream end; nobody awaits the leader task itself
+            logger.error("Coalesced response for %r failed: %s", key, e)
+        finally:
+            await events.aclose()
+            flight.close()
+            self._forget(key, flight)
+
+    async def stream(self, key: str, factory: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = Flight()
+            self._flights[key] = flight
+            flight.task = asyncio.create_task(self._lead(key, flight, factory))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+
+        flight.subscribers += 1
+        try:
+            async for event in flight.replay():
+                yield event
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.task.done():
+                # Nobody is listening any more; later callers start afresh
+                self._forget(key, flight)
+                flight.task.cancel()
@@ -0,0 +1,117 @@
+import re
+import time
+from collections import OrderedDict
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional, Tuple
+from airlines import AIRLINE_ALIASES
+from routes import CITY_ALIASES
+
+# Longest aliases first so "thai vietjet air" wins over "vietjet air"
+_ALIASES = {alias: canonical.lower() for alias, canonical in {**CITY_ALIASES, **AIRLINE_ALIASES}.items()}
+_ALIAS_PATTERN = re.compile(
+    r'\b(' + '|'.join(re.escape(alias) for alias in sorted(_ALIASES, key=len, reverse=True)) + r')\b'
+)
+_ENTITY_PATTERN = re.compile(
+    r'\b(' + '|'.join(re.escape(name) for name in sorted(set(_ALIASES.values()), key=len, reverse=True)) + r')\b'
+    r'|\d+'
+)
+
+def normalize_question(question: str) -> str:
+    """Fold case, whitespace and known city/airline aliases into a canonical question"""
+    question = re.sub(r'\s+', ' ', question.lower()).strip().rstrip('?!. ')
+    return _ALIAS_PATTERN.sub(lambda m: _ALIASES[m.group(1)], question)
+
+def entity_signature(normalized_question: str) -> Tuple[str, ...]:
+    """Ordered cities, airlines and numbers; near-duplicate questions must agree on these exactly"""
+    return tuple(m.group(0) for m in _ENTITY_PATTERN.finditer(normalized_question))
+
+class SQLCache:
+    """
+    Question -> verified SQL cache with an exact tier keyed on the normalized
+    question and an optional similarity tier for near-identical phrasings.
+    Entries expire after `ttl` seconds, the least recently used entry is evicted
+    beyond `max_entries`, and everything is dropped when the schema version changes.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600,
+                 similarity_threshold: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.schema_version = None
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._by_signature: Dict[Tuple[str, ...], List[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _check_schema(self, schema_version) -> None:
+        if schema_version != self.schema_version:
+            self.clear()
+            self.schema_version = schema_version
+
+    def _remove(self, key: str) -> None:
+        self._entries.pop(key, None)
+        signature = entity_signature(key)
+        keys = self._by_signature.get(signature)
+        if keys and key in keys:
+            keys.remove(key)
+            if not keys:
+                del self._by_signature[signature]
+
+    def _lookup(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        sql, stored_at = entry
+        if time.monotonic() - stored_at > self.ttl:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return sql
+
+    def _find_similar(self, key: str) -> Optional[str]:
+        best_key, best_ratio = None, self.similarity_threshold
+        for candidate in list(self._by_signature.get(entity_signature(key), ())):
+            ratio = SequenceMatcher(None, key, candidate).ratio()
+            if ratio >= best_ratio:
+                best_key, best_ratio = candidate, ratio
+        return self._lookup(best_key) if best_key else None
+
+    def get(self, question: str, schema_version=None) -> Optional[str]:
+        self._check_schema(schema_version)
+        key = normalize_question(question)
+
+        sql = self._lookup(key)
+        if sql is not None:
+            self.hits += 1
+            return sql
+
+        if self.similarity_threshold is not None:
+            sql = self._find_similar(key)
+            if sql is not None:
+                self.similar_hits += 1
+                return sql
+
+        self.misses += 1
+        return None
+
+    def put(self, question: str, sql: str, schema_version=None) -> None:
+        self._check_schema(schema_version)
+        key = normalize_question(question)
+
+        if key not in self._entries:
+            self._by_signature.setdefault(entity_signature(key), []).append(key)
+        self._entries[key] = (sql, time.monotonic())
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._by_signature.clear()
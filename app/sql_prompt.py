@@ -42,6 +42,16 @@ Query Generation Rules:
    - 'Non-stop'
    - 'Non stop'
    - 'Direct flight'
+8. Filter and sort on the typed columns, never by parsing the display strings:
+   - flight_date: departure date as 'YYYY-MM-DD' (e.g. flight_date BETWEEN '2025-02-01' AND '2025-02-07')
+   - departure_minutes: departure time as minutes since midnight (e.g. morning is departure_minutes < 720)
+   - duration_minutes: flight duration in minutes (e.g. under 5 hours is duration_minutes < 300)
+   Keep selecting date, time and duration for display.
+9. For questions about which day or date is cheapest, or fares across a range of dates, query the
+   precomputed summary tables instead of aggregating flights (one row per route and flight_date):
+   - route_fare_summary: min_price_inr, median_price_inr, max_price_inr, flight_count
+   - route_airline_fare_summary: the same, per airline
+   - route_stops_fare_summary: the same, split by is_direct (1 for direct flights, 0 otherwise)
 
 STRICTLY output only SQL query. Do not include any additional information or comments.
 """
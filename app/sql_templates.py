@@ -0,0 +1,286 @@
+import re
+import calendar
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any, Collection, Dict, List, Mapping, Optional, Tuple
+from routes import ALLOWED_ROUTES, CITIES
+from sql_cache import normalize_question
+from database import DIRECT_FLIGHT_TYPES
+from sql_tokenizer import iter_tokens
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+_MONTHS = {
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'may': 5, 'jun': 6,
+    'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12
+}
+_MONTH = r'(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*'
+_DATE_PATTERNS = [
+    (re.compile(r'\b(\d{4})-(\d{1,2})-(\d{1,2})\b'), lambda m: (int(m[1]), int(m[2]), int(m[3]))),
+    (re.compile(r'\b(\d{1,2})/(\d{1,2})/(\d{4})\b'), lambda m: (int(m[3]), int(m[2]), int(m[1]))),
+    (re.compile(r'\b(\d{1,2})(?:st|nd|rd|th)?(?: of)? ' + _MONTH + r'\.?(?:,? (\d{4}))?\b'),
+     lambda m: (m[3] and int(m[3]), _MONTHS[m[2]], int(m[1]))),
+    (re.compile(r'\b' + _MONTH + r'\.? (\d{1,2})(?:st|nd|rd|th)?(?:,? (\d{4}))?\b'),
+     lambda m: (m[3] and int(m[3]), _MONTHS[m[1]], int(m[2]))),
+]
+
+_CITY_PATTERN = re.compile(
+    r'\b(' + '|'.join(re.escape(city.lower()) for city in sorted(CITIES, key=len, reverse=True)) + r')\b'
+)
+_CALENDAR_PATTERN = re.compile(
+    r'\b(?:(?:which|what) (?:days?|dates?)|(?:cheapest|best|lowest[- ]fare) (?:days?|dates?)(?: to fly)?|fare calendar)\b'
+)
+_MONTH_RANGE_PATTERN = re.compile(
+    r'\b(?:(?:in|during|for|of|over) )?(?:(this|next) month|' + _MONTH + r'(?: (\d{4}))?)\b'
+)
+_ROUND_TRIP_PATTERN = re.compile(r'\b(round[- ]?trip|return(?:ing)?|both ways|coming back|back on)\b')
+_DIRECT_PATTERN = re.compile(r'\b(direct|non[- ]?stop|without (?:a )?stops?|no stops?)\b')
+_CHEAPEST_PATTERN = re.compile(r'\b(cheapest|cheap|lowest (?:price|fare)s?|least expensive|budget)\b')
+_PRICIEST_PATTERN = re.compile(r'\b(most expensive|priciest|highest (?:price|fare)s?)\b')
+_LIMIT_PATTERN = re.compile(
+    r'\b(\d{1,2})\b(?=\s+(?:(?:cheapest|cheap|direct|non-?stop|most expensive)\s+)*'
+    r'(?:flights?|options?|results?|fares?|tickets?|deals?)\b)'
+)
+
+# Words that carry no constraint beyond what the intent already captures. Any other word
+# means the question asks for something the templates cannot express, so it goes to the LLM.
+# Ordering words such as "first", "top" or "best" are deliberately absent: the templates
+# only sort by price, so "first flight" (earliest departure) must not match them.
+_FILLER_WORDS = {
+    'a', 'an', 'the', 'me', 'i', 'we', 'us', 'my', 'our', 'please', 'pls', 'can', 'could', 'you',
+    'show', 'find', 'list', 'get', 'give', 'search', 'look', 'looking', 'want', 'need', 'book',
+    'what', 'whats', "what's", 'which', 'are', 'is', 'there', 'any', 'all', 'some', 'available',
+    'flight', 'flights', 'fare', 'fares', 'ticket', 'tickets', 'option', 'options', 'deal', 'deals',
+    'result', 'results', 'price', 'prices', 'from', 'to', 'on', 'for', 'of', 'and', 'with', 'in',
+    'one', 'way', 'one-way', 'oneway', 'trip', 'depart', 'departing', 'departure', 'leaving',
+    'outbound', 'by', 'at', 'date', 'dated',
+    'fly', 'flying', 'travel', 'go', 'going', 'be', 'will', 'would', 'have', 'has',
+}
+
+
+@dataclass
+class FlightSearchIntent:
+    origin: str
+    destination: str
+    departure_date: Optional[str] = None
+    return_date: Optional[str] = None
+    round_trip: bool = False
+    direct_only: bool = False
+    sort: Optional[str] = 'price_asc'
+    limit: int = DEFAULT_LIMIT
+    # Fare-calendar questions ("which day is cheapest") rank dates instead of flights
+    calendar: bool = False
+    date_from: Optional[str] = None
+    date_to: Optional[str] = None
+
+
+def _resolve_date(year: Optional[int], month: int, day: int, today: date) -> Optional[str]:
+    try:
+        resolved = date(year or today.year, month, day)
+        # A date without a year means its next occurrence
+        if not year and resolved < today:
+            resolved = date(today.year + 1, month, day)
+    except ValueError:
+        return None
+    return resolved.isoformat()
+
+def _extract_month_range(text: str, today: date) -> Tuple[Optional[Tuple[str, str]], str]:
+    match = _MONTH_RANGE_PATTERN.search(text)
+    if not match:
+        return None, text
+
+    relative, month_name, year = match.groups()
+    if relative:
+        year, month = today.year, today.month
+        if relative == 'next':
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    else:
+        month = _MONTHS[month_name]
+        # A month without a year means its next occurrence
+        year = int(year) if year else today.year + (month < today.month)
+
+    last_day = calendar.monthrange(year, month)[1]
+    date_range = (date(year, month, 1).isoformat(), date(year, month, last_day).isoformat())
+    return date_range, text[:match.start()] + ' ' + text[match.end():]
+
+def extract_dates(text: str, today: date) -> Tuple[List[str], str]:
+    """ISO dates mentioned in a normalized question, in order, and the text without them"""
+    found = []
+    for pattern, to_parts in _DATE_PATTERNS:
+        for match in pattern.finditer(text):
+            iso_date = _resolve_date(*to_parts(match), today)
+            if iso_date is None:
+                return [], text
+            found.append((match.start(), iso_date))
+        text = pattern.sub(' ', text)
+    return [iso_date for _, iso_date in sorted(found)], text
+
+def extract_route(text: str) -> Tuple[Optional[Tuple[str, str]], str]:
+    """Find the (origin, destination) pair in a normalized question and blank it out"""
+    canonical = {city.lower(): city for city in CITIES}
+    mentions = [(m.start(), canonical[m.group(1)]) for m in _CITY_PATTERN.finditer(text)]
+    if len(mentions) != 2 or mentions[0][1] == mentions[1][1]:
+        return None, text
+
+    (first_pos, first), (_, second) = mentions
+    # "to X from Y" names the destination first
+    preceding = text[:first_pos].split()
+    route = (second, first) if preceding and preceding[-1] == 'to' else (first, second)
+    return route, _CITY_PATTERN.sub(' ', text)
+
+def parse_flight_search(question: str, today: Optional[date] = None) -> Optional[FlightSearchIntent]:
+    """
+    Parse a simple route/date/price question into a FlightSearchIntent.
+    Returns None when the question needs anything the templates cannot express.
+    """
+    text = normalize_question(question)
+    today = today or datetime.now().date()
+
+    route, text = extract_route(text)
+    if route is None or route not in ALLOWED_ROUTES:
+        return None
+
+    is_calendar = bool(_CALENDAR_PATTERN.search(text))
+    date_range = None
+    if is_calendar:
+        text = _CALENDAR_PATTERN.sub(' ', text)
+        date_range, text = _extract_month_range(text, today)
+
+    dates, text = extract_dates(text, today)
+    round_trip = bool(_ROUND_TRIP_PATTERN.search(text))
+    if (round_trip and len(dates) != 2) or (not round_trip and len(dates) > 1):
+        return None
+    if is_calendar and (round_trip or dates):
+        return None
+    text = _ROUND_TRIP_PATTERN.sub(' ', text)
+
+    limit = DEFAULT_LIMIT
+    limit_match = _LIMIT_PATTERN.search(text)
+    if limit_match:
+        limit = min(max(int(limit_match.group(1)), 1), MAX_LIMIT)
+        text = text[:limit_match.start(1)] + ' ' + text[limit_match.end(1):]
+
+    direct_only = bool(_DIRECT_PATTERN.search(text))
+    text = _DIRECT_PATTERN.sub(' ', text)
+
+    sort = 'price_asc'
+    if _PRICIEST_PATTERN.search(text):
+        sort = 'price_desc'
+    text = _CHEAPEST_PATTERN.sub(' ', _PRICIEST_PATTERN.sub(' ', text))
+
+    leftover = [word for word in re.findall(r"[\w'-]+|[^\w\s]", text) if word not in _FILLER_WORDS]
+    if any(word not in {',', '?', '!', '.'} for word in leftover):
+        return None
+
+    return FlightSearchIntent(
+        origin=route[0],
+        destination=route[1],
+        departure_date=dates[0] if dates else None,
+        return_date=dates[1] if round_trip else None,
+        round_trip=round_trip,
+        direct_only=direct_only,
+        sort=sort,
+        limit=limit,
+        calendar=is_calendar,
+        date_from=date_range[0] if date_range else None,
+        date_to=date_range[1] if date_range else None
+    )
+
+def _direct_condition(alias: str) -> str:
+    values = ', '.join(f"'{value}'" for value in DIRECT_FLIGHT_TYPES)
+    return f"{alias}flightType IN ({values})"
+
+def render_flight_search(intent: FlightSearchIntent) -> Tuple[str, Dict[str, Any]]:
+    """Render an intent into a parameterized query against the flights table"""
+    direction = 'DESC' if intent.sort == 'price_desc' else 'ASC'
+    params: Dict[str, Any] = {
+        'origin': intent.origin,
+        'destination': intent.destination,
+        'limit': intent.limit
+    }
+
+    if intent.calendar:
+        # Precomputed per-date aggregates; see database.refresh_fare_summaries
+        table = 'route_stops_fare_summary' if intent.direct_only else 'route_fare_summary'
+        conditions = ["origin = :origin", "destination = :destination"]
+        if intent.direct_only:
+            conditions.append("is_direct = 1")
+        if intent.date_from:
+            conditions.append("flight_date BETWEEN :date_from AND :date_to")
+            params['date_from'] = intent.date_from
+            params['date_to'] = intent.date_to
+        sql = (
+            "SELECT flight_date, min_price_inr, median_price_inr, max_price_inr, flight_count "
+            f"FROM {table} WHERE {' AND '.join(conditions)} "
+            f"ORDER BY min_price_inr {direction}, flight_date LIMIT :limit"
+        )
+        return sql, params
+
+    if not intent.round_trip:
+        conditions = ["origin = :origin", "destination = :destination"]
+        if intent.departure_date:
+            conditions.append("flight_date = :departure_date")
+            params['departure_date'] = intent.departure_date
+        if intent.direct_only:
+            conditions.append(_direct_condition(''))
+        sql = (
+            "SELECT id, airline, time, date, duration, flightType, price_inr FROM flights "
+            f"WHERE {' AND '.join(conditions)} "
+            f"ORDER BY price_inr {direction} LIMIT :limit"
+        )
+        return sql, params
+
+    conditions = [
+        "o.origin = :origin", "o.destination = :destination", "o.flight_date = :departure_date",
+        "r.flight_date = :return_date"
+    ]
+    params['departure_date'] = intent.departure_date
+    params['return_date'] = intent.return_date
+    if intent.direct_only:
+        conditions += [_direct_condition('o.'), _direct_condition('r.')]
+    sql = (
+        "SELECT o.id, o.airline, o.time, o.date, o.duration, o.flightType, o.price_inr, "
+        "r.id AS return_id, r.airline AS return_airline, r.time AS return_time, "
+        "r.date AS return_date, r.duration AS return_duration, r.flightType AS return_flightType, "
+        "r.price_inr AS return_price_inr, o.price_inr + r.price_inr AS total_price_inr "
+        "FROM flights o JOIN flights r ON r.origin = o.destination AND r.destination = o.origin "
+        f"WHERE {' AND '.join(conditions)} "
+        f"ORDER BY total_price_inr {direction} LIMIT :limit"
+    )
+    return sql, params
+
+def sql_literal(value: Any) -> str:
+    if value is None:
+        return 'NULL'
+    if isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+def inline_params(sql: str, params: Optional[Dict[str, Any]]) -> str:
+    """The query with its :name parameters written out as literals, for display and prompts"""
+    if not params:
+        return sql
+    return ''.join(
+        sql_literal(params[text[1:]]) if kind == 'param' and text[1:] in params else text
+        for kind, text in iter_tokens(sql)
+    )
+
+def schema_supports(intent: FlightSearchIntent, columns: Mapping[str, Collection[str]]) -> bool:
+    """Whether the tables and columns the rendered query reads exist, given table -> column names"""
+    if intent.calendar:
+        table = 'route_stops_fare_summary' if intent.direct_only else 'route_fare_summary'
+        return table in columns
+    # Dates are matched against the canonical ISO column; the raw `date` text never equals them
+    if intent.departure_date:
+        return 'flight_date' in columns.get('flights', ())
+    return True
+
+def match_template(question: str, columns: Mapping[str, Collection[str]]) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """Return a parameterized query for the question, or None to fall back to the LLM"""
+    intent = parse_flight_search(question)
+    if intent is None or not schema_supports(intent, columns):
+        return None
+    return render_flight_search(intent)
@@ -0,0 +1,39 @@
+import re
+from typing import Iterator, List, NamedTuple
+
+class Token(NamedTuple):
+    kind: str
+    text: str
+
+# Order matters: comments and literals are matched before the operators they contain.
+# LLM artefacts (<|END_RESPONSE|> markers, markdown fences) get their own kinds.
+_TOKEN_PATTERN = re.compile(r"""
+    (?P<special><\|[^\n]*?\|>)
+  | (?P<fence>```(?:[ \t]*(?i:sqlite|sql)\b)?)
+  | (?P<string>'(?:[^']|'')*(?:'|$))
+  | (?P<quoted>"(?:[^"]|"")*(?:"|$)|`[^`]*(?:`|$)|\[[^\]]*(?:\]|$))
+  | (?P<comment>--[^\n]*|/\*.*?(?:\*/|$))
+  | (?P<ws>\s+)
+  | (?P<number>\d+(?:\.\d*)?(?:[eE][-+]?\d+)?|\.\d+(?:[eE][-+]?\d+)?)
+  | (?P<word>[A-Za-z_][A-Za-z0-9_$]*)
+  | (?P<param>[:@$]\w+|\?\d*)
+  | (?P<op><=|>=|<>|!=|==|\|\||[-+*/%=<>(),.;&|~])
+  | (?P<other>.)
+""", re.VERBOSE | re.DOTALL)
+
+def iter_tokens(sql: str) -> Iterator[Token]:
+    """Split SQL into tokens without ever looking inside string literals or comments"""
+    for match in _TOKEN_PATTERN.finditer(sql):
+        yield Token(match.lastgroup, match.group())
+
+TRIVIA = frozenset({'ws', 'comment', 'special', 'fence'})
+
+def tokenize(sql: str, skip_trivia: bool = True) -> List[Token]:
+    """Tokenize SQL, dropping whitespace, comments and LLM artefacts unless skip_trivia is False"""
+    return [token for token in iter_tokens(sql)
+            if not (skip_trivia and token.kind in TRIVIA)]
+
+def string_value(token: Token) -> str:
+    """Unquote a string literal token"""
+    text = token.text[1:-1] if token.text.endswith("'") and len(token.text) > 1 else token.text[1:]
+    return text.replace("''", "'")
@@ -0,0 +1,566 @@
+import re
+from datetime import date, datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+from sqlalchemy.exc import SQLAlchemyError
+from airlines import VALID_AIRLINES
+from database import DIRECT_FLIGHT_TYPES
+from routes import ALLOWED_ROUTES, CITIES
+from sql_cache import normalize_question
+from sql_templates import extract_route, extract_dates
+from sql_tokenizer import Token, tokenize, string_value
+
+VALID = "valid"
+INVALID = "invalid"
+INCONCLUSIVE = "inconclusive"
+
+# Statements that write to or reconfigure the database
+FORBIDDEN_KEYWORDS = {
+    'INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'UPSERT', 'DROP', 'ALTER', 'CREATE',
+    'ATTACH', 'DETACH', 'PRAGMA', 'VACUUM', 'REINDEX', 'ANALYZE', 'BEGIN', 'COMMIT'
+}
+
+_LITERAL_COLUMNS = {'airline', 'origin', 'destination'}
+_CANONICAL_AIRLINES = {airline.lower(): airline for airline in VALID_AIRLINES}
+
+# Question constraints beyond the route. A query is only accepted without the LLM verifier
+# when it visibly encodes every one of them; otherwise the check is inconclusive.
+_RELATIVE_DATE_PATTERN = re.compile(
+    r'\b(today|tonight|tomorrow|weekend|weekdays?|week|month|year|'
+    r'(?:mon|tues|wednes|thurs|fri|satur|sun)day|'
+    r'(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*)\b'
+)
+_TIME_OF_DAY_PATTERN = re.compile(
+    r"\b(morning|afternoon|evening|night|overnight|noon|midnight|red[- ]?eye|early|late|"
+    r"o'?clock|\d{1,2}(?::\d{2})?\s*[ap]\.?m\b|\d{1,2}:\d{2})"
+)
+# Wording that bounds departure_minutes; anything else matching _TIME_OF_DAY_PATTERN is too vague to check
+_CLOCK_BOUND_PATTERN = re.compile(r'\b(after|from|before|by|until|till)\s+(\d{1,2})(?::(\d{2}))?\s*(?:([ap])\.?m\b)?')
+_PRICE_BOUND_PATTERN = re.compile(
+    r'(?:\b(under|below|less than|cheaper than|over|above|more than|at least|at most|up to|'
+    r'within|max(?:imum)?|min(?:imum)?|budget(?: of)?|between|and)\s*(?:rs\.?|inr|₹)?\s*|₹\s*)'
+    r'(\d[\d,]*(?:\.\d+)?k?)'
+    r'|\b(\d[\d,]*(?:\.\d+)?k?)\s*(?:rs|inr|rupees)\b'
+)
+_UPPER_BOUND_WORDS = {'under', 'below', 'less than', 'cheaper than', 'at most', 'up to', 'within',
+                      'max', 'maximum', 'budget', 'budget of'}
+_LOWER_BOUND_WORDS = {'over', 'above', 'more than', 'at least', 'min', 'minimum'}
+_COUNT_PATTERN = re.compile(r'\b(how many|number of|count)\b')
+_DURATION_PATTERN = re.compile(r'\b(shortest|fastest|quickest|longest|duration|hours?|hrs?|minutes?|mins?)\b')
+# Aggregate wording and the SQL tokens (any one of) that express it
+_AGGREGATE_PATTERNS = (
+    (re.compile(r'\b(average|avg|mean|typical)\b'), {'AVG'}),
+    (re.compile(r'\bmedian\b'), {'MEDIAN_PRICE_INR'}),
+    (re.compile(r'\b(total|sum)\b'), {'SUM', '+'}),
+    (re.compile(r'\b(minimum|min|lowest)\b'), {'MIN', 'ORDER', 'MIN_PRICE_INR'}),
+    (re.compile(r'\b(maximum|max|highest)\b'), {'MAX', 'ORDER', 'MAX_PRICE_INR'}),
+)
+
+# Sort wording, checked against ORDER BY direction or MIN/MAX: (pattern, column group, direction)
+_SORT_PATTERNS = (
+    (re.compile(r'\b(cheapest|lowest|least expensive)\b'), 'price', 'ASC'),
+    (re.compile(r'\b(most expensive|priciest|highest)\b'), 'price', 'DESC'),
+    (re.compile(r'\b(shortest|fastest|quickest)\b'), 'duration_minutes', 'ASC'),
+    (re.compile(r'\blongest\b'), 'duration_minutes', 'DESC'),
+)
+
+# Anything the comparisons below cannot be read through; such queries go to the LLM verifier
+_UNREADABLE = {'NOT', 'OR', '!=', '<>', 'UNION', 'EXCEPT', 'INTERSECT'}
+_COMPARISON_OPERATORS = {'=', '==', '<', '<=', '>', '>='}
+_WORD_OPERATORS = {'LIKE', 'IN', 'BETWEEN', 'IS', 'GLOB', 'MATCH', 'REGEXP'}
+_CASE_FUNCTIONS = {'LOWER', 'UPPER', 'TRIM'}
+
+class StaticCheck(NamedTuple):
+    status: str
+    reason: str = ""
+
+class ColumnLiteral(NamedTuple):
+    column: str
+    operator: str
+    value: str
+
+class Predicate(NamedTuple):
+    """A comparison of a column (lower-case, without its table alias) with literals or a MIN/MAX subquery"""
+    column: str
+    operator: str
+    values: Tuple[str, ...] = ()
+    subquery: Optional[str] = None
+
+class Bound(NamedTuple):
+    side: str
+    value: float
+    required: bool = True
+    tolerance: float = 0
+
+# Time-of-day words and the departure_minutes bounds they imply; see sql_prompt
+_DAY_PERIODS = {
+    'morning': (Bound('lower', 300, False, 60), Bound('upper', 720, True, 60)),
+    'afternoon': (Bound('lower', 720, True, 60), Bound('upper', 1020, True, 60)),
+    'evening': (Bound('lower', 1020, True, 60), Bound('upper', 1440, False, 60)),
+}
+
+def _statement_error(tokens: List[Token]) -> Optional[str]:
+    if not tokens:
+        return "The query is empty"
+
+    semicolons = [i for i, token in enumerate(tokens) if token.text == ';']
+    if semicolons and semicolons[0] != len(tokens) - 1:
+        return "Only a single SQL statement is allowed"
+
+    if tokens[0].kind != 'word' or tokens[0].text.upper() not in ('SELECT', 'WITH'):
+        return "Only SELECT queries are allowed"
+
+    for i, token in enumerate(tokens):
+        # REPLACE(duration, 'h', '') is a string function, not a REPLACE statement
+        is_call = i + 1 < len(tokens) and tokens[i + 1].text == '('
+        if token.kind == 'word' and token.text.upper() in FORBIDDEN_KEYWORDS and not is_call:
+            return f"{token.text.upper()} statements are not allowed; only read-only SELECT queries"
+    return None
+
+def _table_error(tokens: List[Token], known_tables: Set[str]) -> Optional[str]:
+    cte_names = {tokens[i - 1].text.lower() for i, token in enumerate(tokens)
+                 if i > 0 and token.kind == 'word' and token.text.upper() == 'AS'
+                 and i + 1 < len(tokens) and tokens[i + 1].text == '('}
+
+    for i, token in enumerate(tokens[:-1]):
+        if token.kind != 'word' or token.text.upper() not in ('FROM', 'JOIN'):
+            continue
+        name_token = tokens[i + 1]
+        if name_token.kind not in ('word', 'quoted'):
+            continue
+        name = name_token.text.strip('"`[]').lower()
+        if name not in known_tables and name not in cte_names:
+            return (f"Unknown table '{name_token.text}'. "
+                    f"Available tables: {', '.join(sorted(known_tables))}")
+    return None
+
+def extract_column_literals(tokens: List[Token]) -> List[ColumnLiteral]:
+    """Collect string literals compared against the airline, origin and destination columns"""
+    literals = []
+    for i, token in enumerate(tokens):
+        if token.kind != 'word' or token.text.lower() not in _LITERAL_COLUMNS:
+            continue
+
+        j = i + 1
+        # LOWER(origin) = 'mumbai' and similar wrappers
+        while j < len(tokens) and tokens[j].text == ')':
+            j += 1
+        if j >= len(tokens):
+            continue
+
+        operator = tokens[j].text.upper()
+        if operator in ('=', '==', 'LIKE') and j + 1 < len(tokens) and tokens[j + 1].kind == 'string':
+            literals.append(ColumnLiteral(token.text.lower(), operator, string_value(tokens[j + 1])))
+        elif operator == 'IN' and j + 1 < len(tokens) and tokens[j + 1].text == '(':
+            k = j + 2
+            while k < len(tokens) and tokens[k].text != ')':
+                if tokens[k].kind == 'string':
+                    literals.append(ColumnLiteral(token.text.lower(), '=', string_value(tokens[k])))
+                k += 1
+    return literals
+
+def _matches(literal: ColumnLiteral, candidates: Iterable[str]) -> List[str]:
+    value = literal.value.lower()
+    if literal.operator == 'LIKE':
+        pattern = re.compile(
+            ''.join('.*' if ch == '%' else '.' if ch == '_' else re.escape(ch) for ch in value) + r'\Z'
+        )
+        return [name for name in candidates if pattern.match(name.lower())]
+    return [name for name in candidates if name.lower() == value]
+
+def _literal_error(literals: List[ColumnLiteral]) -> Optional[str]:
+    origins, destinations = [], []
+    for literal in literals:
+        if literal.column == 'airline':
+            if not _matches(literal, VALID_AIRLINES):
+                return (f"Unknown airline '{literal.value}'. "
+                        f"Valid airlines: {', '.join(sorted(VALID_AIRLINES))}")
+            continue
+
+        cities = _matches(literal, CITIES)
+        if not cities:
+            return (f"Unknown {literal.column} '{literal.value}'. "
+                    f"Valid cities: {', '.join(sorted(CITIES))}")
+        if literal.operator != 'LIKE':
+            (origins if literal.column == 'origin' else destinations).append(cities[0])
+
+    if len(origins) == 1 and len(destinations) == 1 and (origins[0], destinations[0]) not in ALLOWED_ROUTES:
+        return f"The route {origins[0]} to {destinations[0]} is not served by any flight in the database"
+    return None
+
+def _operand_column(tokens: List[Token], i: int) -> Optional[str]:
+    """The column left of the operator at i, looking through one LOWER()/UPPER()/TRIM() wrapper"""
+    j = i - 1
+    wrapped = j >= 0 and tokens[j].text == ')'
+    if wrapped:
+        j -= 1
+    if j < 0 or tokens[j].kind not in ('word', 'quoted'):
+        return None
+    start = j - 2 if j >= 2 and tokens[j - 1].text == '.' else j
+    if wrapped and not (start >= 2 and tokens[start - 1].text == '('
+                        and tokens[start - 2].text.upper() in _CASE_FUNCTIONS):
+        return None
+    return tokens[j].text.strip('"`[]').lower()
+
+def _literal_at(tokens: List[Token], i: int) -> Tuple[Optional[str], int]:
+    """The string or number literal starting at i, and the index after it"""
+    if i < len(tokens) and tokens[i].kind == 'string':
+        return string_value(tokens[i]), i + 1
+    if i < len(tokens) and tokens[i].kind == 'number':
+        return tokens[i].text, i + 1
+    if i + 1 < len(tokens) and tokens[i].text == '-' and tokens[i + 1].kind == 'number':
+        return '-' + tokens[i + 1].text, i + 2
+    return None, i
+
+def _is_column_at(tokens: List[Token], i: int) -> bool:
+    if i >= len(tokens) or tokens[i].kind not in ('word', 'quoted'):
+        return False
+    if i + 2 < len(tokens) and tokens[i + 1].text == '.':
+        i += 2
+    return not (i + 1 < len(tokens) and tokens[i + 1].text == '(')
+
+def extract_predicates(tokens: List[Token]) -> Optional[List[Predicate]]:
+    """
+    Every comparison in the query as a Predicate, skipping column = column join conditions.
+    Returns None when any comparison has another shape, e.g. `1 = 1` or `price_inr IS NULL`.
+    """
+    predicates = []
+    for i, token in enumerate(tokens):
+        operator = token.text.upper()
+        if not ((token.kind == 'op' and operator in _COMPARISON_OPERATORS)
+                or (token.kind == 'word' and operator in _WORD_OPERATORS)):
+            continue
+        column = _operand_column(tokens, i)
+        if column is None:
+            return None
+        operator = '=' if operator == '==' else operator
+
+        if operator == 'IN':
+            if i + 1 >= len(tokens) or tokens[i + 1].text != '(':
+                return None
+            values, j = [], i + 2
+            while True:
+                value, j = _literal_at(tokens, j)
+                if value is None:
+                    return None
+                values.append(value)
+                if j < len(tokens) and tokens[j].text == ',':
+                    j += 1
+                    continue
+                break
+            if j >= len(tokens) or tokens[j].text != ')':
+                return None
+            predicates.append(Predicate(column, operator, tuple(values)))
+        elif operator == 'BETWEEN':
+            low, j = _literal_at(tokens, i + 1)
+            if low is None or j >= len(tokens) or tokens[j].text.upper() != 'AND':
+                return None
+            high, _ = _literal_at(tokens, j + 1)
+            if high is None:
+                return None
+            predicates.append(Predicate(column, operator, (low, high)))
+        elif operator in _COMPARISON_OPERATORS or operator == 'LIKE':
+            value, _ = _literal_at(tokens, i + 1)
+            if value is not None:
+                predicates.append(Predicate(column, operator, (value,)))
+            elif operator == '=' and _is_column_at(tokens, i + 1):
+                continue
+            elif (operator == '=' and i + 3 < len(tokens) and tokens[i + 1].text == '('
+                  and tokens[i + 2].text.upper() == 'SELECT' and tokens[i + 3].text.upper() in ('MIN', 'MAX')):
+                predicates.append(Predicate(column, operator, subquery=tokens[i + 3].text.upper()))
+            else:
+                return None
+        else:
+            return None
+    return predicates
+
+def _column_group(column: str) -> str:
+    # price_inr, min_price_inr, total_price_inr, ... all bound the same question wording
+    return 'price' if column.endswith('price_inr') else column
+
+def _order_items(tokens: List[Token]) -> List[Tuple[Set[str], str]]:
+    """The column groups and direction of each ORDER BY term, in the query and its subqueries"""
+    items = []
+    for i in range(len(tokens) - 1):
+        if tokens[i].text.upper() != 'ORDER' or tokens[i + 1].text.upper() != 'BY':
+            continue
+        depth, groups, direction = 0, set(), 'ASC'
+        for token in tokens[i + 2:]:
+            upper = token.text.upper()
+            if token.text == '(':
+                depth += 1
+            elif token.text == ')' and depth:
+                depth -= 1
+            elif token.text in (')', ';') or (depth == 0 and upper in ('LIMIT', 'OFFSET')):
+                break
+            elif depth == 0 and token.text == ',':
+                items.append((groups, direction))
+                groups, direction = set(), 'ASC'
+            elif upper in ('ASC', 'DESC'):
+                direction = upper
+            elif token.kind in ('word', 'quoted'):
+                groups.add(_column_group(token.text.strip('"`[]').lower()))
+        if groups:
+            items.append((groups, direction))
+    return items
+
+def _aggregates(tokens: List[Token], function: str, group: str) -> bool:
+    """Whether the query applies MIN or MAX to a column of the group"""
+    for i, token in enumerate(tokens[:-1]):
+        if token.text.upper() != function or tokens[i + 1].text != '(':
+            continue
+        depth = 0
+        for inner in tokens[i + 1:]:
+            depth += (inner.text == '(') - (inner.text == ')')
+            if depth == 0:
+                break
+            if inner.kind == 'word' and _column_group(inner.text.lower()) == group:
+                return True
+    return False
+
+def _sorted_by(tokens: List[Token], group: str, direction: str) -> bool:
+    """Whether the query orders by the group only in the given direction, or takes its MIN/MAX"""
+    items = [item_direction for groups, item_direction in _order_items(tokens) if group in groups]
+    if any(item_direction != direction for item_direction in items):
+        return False
+    return bool(items) or _aggregates(tokens, 'MIN' if direction == 'ASC' else 'MAX', group)
+
+def _encodes_names(predicates: List[Predicate], candidates: Iterable[str],
+                   allowed: Set[str], required: Set[str]) -> bool:
+    """Whether the predicates select only allowed names, and every required one"""
+    selected = set()
+    for predicate in predicates:
+        if predicate.operator not in ('=', 'IN', 'LIKE'):
+            return False
+        for value in predicate.values:
+            names = set(_matches(ColumnLiteral(predicate.column, predicate.operator, value), candidates))
+            if not names or not names <= allowed:
+                return False
+            selected |= names
+    return required <= selected
+
+def _encodes_bounds(predicates: List[Predicate], bounds: List[Bound]) -> bool:
+    """Whether the range predicates are exactly the expected bounds, with operators facing the right way"""
+    found = []
+    for predicate in predicates:
+        try:
+            values = [float(value) for value in predicate.values]
+        except ValueError:
+            return False
+        if predicate.operator == 'BETWEEN':
+            found += [('lower', values[0]), ('upper', values[1])]
+        elif predicate.operator in ('>', '>='):
+            found.append(('lower', values[0]))
+        elif predicate.operator in ('<', '<='):
+            found.append(('upper', values[0]))
+        else:
+            return False
+
+    def fits(side: str, value: float, bound: Bound) -> bool:
+        return side == bound.side and abs(value - bound.value) <= bound.tolerance
+
+    if not all(any(fits(side, value, bound) for bound in bounds) for side, value in found):
+        return False
+    return all(any(fits(side, value, bound) for side, value in found) for bound in bounds if bound.required)
+
+def _clock_minutes(hour: str, minute: Optional[str], meridiem: Optional[str]) -> Optional[int]:
+    hours, minutes = int(hour), int(minute or 0)
+    if meridiem:
+        if not 1 <= hours <= 12:
+            return None
+        hours = hours % 12 + (12 if meridiem == 'p' else 0)
+    if hours > 23 or minutes > 59:
+        return None
+    return hours * 60 + minutes
+
+def _time_bounds(text: str) -> Optional[List[Bound]]:
+    """The departure_minutes bounds the question asks for, or None when its time wording is vague"""
+    bounds = []
+    for match in _CLOCK_BOUND_PATTERN.finditer(text):
+        word, hour, minute, meridiem = match.groups()
+        if not (minute or meridiem):
+            continue
+        minutes = _clock_minutes(hour, minute, meridiem)
+        if minutes is None:
+            return None
+        bounds.append(Bound('lower' if word in ('after', 'from') else 'upper', minutes))
+        text = text.replace(match.group(0), ' ')
+
+    for period, period_bounds in _DAY_PERIODS.items():
+        pattern = rf'\b{period}s?\b'
+        if re.search(pattern, text):
+            bounds.extend(period_bounds)
+            text = re.sub(pattern, ' ', text)
+    return None if _TIME_OF_DAY_PATTERN.search(text) else bounds
+
+def _price_bounds(text: str) -> Optional[List[Bound]]:
+    """The price bounds the question asks for, or None when an amount has no clear direction"""
+    bounds, previous = [], None
+    for match in _PRICE_BOUND_PATTERN.finditer(text):
+        word = match.group(1)
+        value = _price_value(match.group(2) or match.group(3))
+        if value is None:
+            return None
+        if word in _UPPER_BOUND_WORDS or (word == 'and' and previous == 'between'):
+            bounds.append(Bound('upper', value))
+        elif word in _LOWER_BOUND_WORDS or word == 'between':
+            bounds.append(Bound('lower', value))
+        else:
+            return None
+        previous = word
+    return bounds
+
+def _covers_question(question: str, tokens: List[Token], today: Optional[date] = None) -> bool:
+    """
+    Whether the query encodes exactly what the question asks for: every constraint appears
+    with a matching operator, value and sort direction, and every predicate in the query is
+    explained by the question. Negations, OR and unreadable comparisons are left to the LLM.
+    """
+    if any(token.kind in ('word', 'op') and token.text.upper() in _UNREADABLE for token in tokens):
+        return False
+    predicates = extract_predicates(tokens)
+    if predicates is None:
+        return False
+
+    text = normalize_question(question)
+    route, _ = extract_route(text)
+    if route is None:
+        return False
+
+    words = {token.text.upper() for token in tokens if token.kind == 'word'}
+    round_trip = bool(re.search(r'\b(round[- ]?trip|return|both ways)\b', text))
+    if round_trip and 'JOIN' not in words:
+        return False
+
+    sorts = {(group, direction) for pattern, group, direction in _SORT_PATTERNS if pattern.search(text)}
+    if not all(_sorted_by(tokens, group, direction) for group, direction in sorts):
+        return False
+
+    by_column: Dict[str, List[Predicate]] = {}
+    for predicate in predicates:
+        if predicate.subquery:
+            # price_inr = (SELECT MIN(price_inr) ...) is how some queries say "cheapest"
+            direction = 'ASC' if predicate.subquery == 'MIN' else 'DESC'
+            if (_column_group(predicate.column), direction) not in sorts:
+                return False
+            continue
+        by_column.setdefault(_column_group(predicate.column), []).append(predicate)
+
+    # A round trip's return leg flies the route backwards
+    legs = set(route) if round_trip else set()
+    if not _encodes_names(by_column.pop('origin', []), CITIES, {route[0]} | legs, {route[0]}):
+        return False
+    if not _encodes_names(by_column.pop('destination', []), CITIES, {route[1]} | legs, {route[1]}):
+        return False
+
+    airlines_asked = {name for alias, name in _CANONICAL_AIRLINES.items() if re.search(rf'\b{re.escape(alias)}\b', text)}
+    if not _encodes_names(by_column.pop('airline', []), VALID_AIRLINES, airlines_asked, airlines_asked):
+        return False
+
+    flight_types = by_column.pop('flighttype', [])
+    is_direct = by_column.pop('is_direct', [])
+    if re.search(r'\b(direct|non[- ]?stop)\b', text):
+        if not flight_types and not is_direct:
+            return False
+        if not _encodes_names(flight_types, DIRECT_FLIGHT_TYPES, set(DIRECT_FLIGHT_TYPES), set()):
+            return False
+        if any(predicate.operator != '=' or predicate.values != ('1',) for predicate in is_direct):
+            return False
+    elif flight_types or is_direct:
+        return False
+
+    return _encodes_constraints(text, tokens, by_column, today)
+
+def _price_value(text: str) -> Optional[int]:
+    text = text.replace(',', '')
+    try:
+        return round(float(text[:-1]) * 1000) if text.endswith('k') else round(float(text))
+    except ValueError:
+        return None
+
+def _encodes_constraints(text: str, tokens: List[Token], by_column: Dict[str, List[Predicate]],
+                         today: Optional[date] = None) -> bool:
+    """
+    Whether the date, time and price predicates match the question's exactly, counts and
+    aggregates show up in the SQL, and no predicate is left that the question does not explain
+    """
+    dates, rest = extract_dates(text, today or datetime.now().date())
+    # Relative dates would need today's calendar arithmetic redone here; the verifier checks them
+    if _RELATIVE_DATE_PATTERN.search(rest):
+        return False
+    queried_dates = set()
+    for predicate in by_column.pop('flight_date', []):
+        if predicate.operator not in ('=', 'IN'):
+            return False
+        queried_dates.update(predicate.values)
+    if queried_dates != set(dates):
+        return False
+
+    time_bounds = _time_bounds(rest)
+    if time_bounds is None or not _encodes_bounds(by_column.pop('departure_minutes', []), time_bounds):
+        return False
+    price_bounds = _price_bounds(rest)
+    if price_bounds is None or not _encodes_bounds(by_column.pop('price', []), price_bounds):
+        return False
+    # Only shortest/longest (a sort) is understood; duration ranges go to the verifier
+    if set(_DURATION_PATTERN.findall(rest)) - {'shortest', 'fastest', 'quickest', 'longest'}:
+        return False
+    if by_column:
+        return False
+
+    symbols = {token.text.upper() for token in tokens if token.kind in ('word', 'op')}
+    if _COUNT_PATTERN.search(rest) and 'COUNT' not in symbols:
+        return False
+    return all(symbols & required for pattern, required in _AGGREGATE_PATTERNS if pattern.search(rest))
+
+def explain_error(sql: str, engine) -> Optional[str]:
+    """Compile the query with EXPLAIN so SQLite reports unknown columns and syntax errors"""
+    try:
+        with engine.connect() as conn:
+            conn.exec_driver_sql(f"EXPLAIN {sql.rstrip().rstrip(';')}").fetchall()
+    except SQLAlchemyError as e:
+        message = getattr(e, 'orig', None) or e
+        return f"SQLite rejected the query: {message}"
+    return None
+
+# Low-cardinality labels for the reasons above, for metrics
+_REASON_CATEGORIES = (
+    (re.compile(r"The query is empty"), "empty"),
+    (re.compile(r"Only a single SQL statement"), "multiple_statements"),
+    (re.compile(r"Only SELECT queries|\w+ statements are not allowed"), "not_read_only"),
+    (re.compile(r"Unknown table"), "unknown_table"),
+    (re.compile(r"Unknown airline"), "unknown_airline"),
+    (re.compile(r"Unknown (origin|destination)"), "unknown_city"),
+    (re.compile(r"The route .* is not served"), "unserved_route"),
+    (re.compile(r"SQLite rejected"), "sqlite_error"),
+)
+
+def reason_category(reason: str) -> str:
+    for pattern, category in _REASON_CATEGORIES:
+        if pattern.match(reason):
+            return category
+    return "other"
+
+def check_sql(question: str, sql: str, engine, known_tables: Iterable[str],
+              today: Optional[date] = None) -> StaticCheck:
+    """
+    Validate generated SQL locally before paying for an LLM verification round-trip.
+    Returns INVALID with a concrete reason, VALID when the query is well formed and
+    visibly answers the question's route, or INCONCLUSIVE when only an LLM can tell.
+    """
+    tokens = tokenize(sql)
+
+    error = (
+        _statement_error(tokens)
+        or _table_error(tokens, {table.lower() for table in known_tables})
+    )
+    if error:
+        return StaticCheck(INVALID, error)
+
+    literals = extract_column_literals(tokens)
+    error = _literal_error(literals) or explain_error(sql, engine)
+    if error:
+        return StaticCheck(INVALID, error)
+
+    if _covers_question(question, tokens, today):
+        return StaticCheck(VALID)
+    return StaticCheck(INCONCLUSIVE)
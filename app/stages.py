@@ -0,0 +1,56 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, NamedTuple
+
+class StageTiming(NamedTuple):
+    started: float   # seconds after the graph was created
+    duration: float  # seconds spent in the stage itself, excluding waits on dependencies
+
+class StageGraph:
+    """
+    Minimal DAG scheduler for one request: each stage is a task that awaits only the
+    stages it depends on, then runs with their results as arguments. Independent
+    stages therefore run concurrently. Start and duration of each stage are recorded.
+    """
+
+    def __init__(self):
+        self.created_at = time.perf_counter()
+        self.timings: Dict[str, StageTiming] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def add(self, name: str, func: Callable[..., Awaitable[Any]], *depends_on: str) -> asyncio.Task:
+        """Schedule `func(*results of depends_on)` as soon as those stages have finished"""
+        dependencies = [self._tasks[dependency] for dependency in depends_on]
+
+        async def run():
+            inputs = [await dependency for dependency in dependencies]
+            started = time.perf_counter()
+            try:
+                return await func(*inputs)
+            finally:
+                self.timings[name] = StageTiming(started - self.created_at, time.perf_counter() - started)
+
+        task = asyncio.create_task(run(), name=name)
+        self._tasks[name] = task
+        return task
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._tasks
+
+    def __getitem__(self, name: str) -> asyncio.Task:
+        return self._tasks[name]
+
+    def cancel(self) -> None:
+        """Cancel unfinished stages, e.g. when the client disconnects or an earlier stage failed"""
+        for task in self._tasks.values():
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                # Mark failures as retrieved; the stage that needed the result reported them
+                task.exception()
+
+    def format_timings(self) -> str:
+        return ", ".join(
+            f"{name} +{timing.started * 1000:.0f}ms {timing.duration * 1000:.0f}ms"
+            for name, timing in sorted(self.timings.items(), key=lambda item: item[1].started)
+        )
@@ -1,7 +1,98 @@
-import re
-from typing import Union
+import time
+from typing import Callable, List, Optional, Union
 from langchain_core.messages import AIMessage
 
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+SENTENCE_ENDS = frozenset('.!?\n')
+
+class ThinkTagFilter:
+    """
+    Incremental <think>...</think> remover for streamed text. Tag state is kept across
+    chunks, and a chunk ending in a possible partial tag ("<thi") holds that suffix back
+    until the next chunk decides it, so each chunk is scanned once.
+    """
+
+    def __init__(self):
+        self.in_think = False
+        self._pending = ""
+
+    def feed(self, chunk: str) -> str:
+        """Visible text from this chunk"""
+        text = self._pending + chunk
+        self._pending = ""
+        visible = []
+        position = 0
+        while True:
+            tag = THINK_CLOSE if self.in_think else THINK_OPEN
+            index = text.find(tag, position)
+            if index == -1:
+                break
+            if not self.in_think:
+                visible.append(text[position:index])
+            position = index + len(tag)
+            self.in_think = not self.in_think
+
+        # Hold back the longest suffix that could still become the tag
+        held = 0
+        for length in range(min(len(tag) - 1, len(text) - position), 0, -1):
+            if text.endswith(tag[:length]):
+                held = length
+                break
+        end = len(text) - held
+        if not self.in_think:
+            visible.append(text[position:end])
+        self._pending = text[end:]
+        return ''.join(visible)
+
+    def flush(self) -> str:
+        """Text held back at the end of the stream; an unclosed think block is dropped"""
+        pending, self._pending = self._pending, ""
+        return "" if self.in_think else pending
+
+class SentenceChunker:
+    """
+    Buffers streamed text and releases it at boundaries: immediately at a sentence end,
+    or at a word boundary once the oldest buffered text is `max_latency` seconds old or
+    the buffer reaches `max_chars`. Text with no boundary at all is released at twice
+    `max_chars`. Only the end of each incoming piece is inspected.
+    """
+
+    def __init__(self, max_latency: float = 0.25, max_chars: int = 200,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_latency = max_latency
+        self.max_chars = max_chars
+        self.clock = clock
+        self._parts: List[str] = []
+        self._size = 0
+        self._started_at: Optional[float] = None
+
+    def feed(self, text: str) -> Optional[str]:
+        """Buffered text if this piece completes a flushable chunk, else None"""
+        if not text:
+            return None
+        if not self._parts:
+            self._started_at = self.clock()
+        self._parts.append(text)
+        self._size += len(text)
+
+        last = text[-1]
+        if last in SENTENCE_ENDS:
+            return self.flush()
+        if last.isspace() or last == ',':
+            if self._size >= self.max_chars or self.clock() - self._started_at >= self.max_latency:
+                return self.flush()
+        elif self._size >= 2 * self.max_chars:
+            return self.flush()
+        return None
+
+    def flush(self) -> str:
+        text = ''.join(self._parts)
+        self._parts = []
+        self._size = 0
+        self._started_at = None
+        return text
+
 def strip_think_tags(response: Union[str, AIMessage]) -> str:
     """
     Remove <think> tags and their content from the response
@@ -15,7 +106,7 @@ def strip_think_tags(response: Union[str, AIMessage]) -> str:
     else:
         response_content = str(response)
 
-    # Remove <think> tags and their content using regex
-    clean_content = re.sub(r'<think>.*?</think>', '', response_content, flags=re.DOTALL).strip()
+    think_filter = ThinkTagFilter()
+    clean_content = (think_filter.feed(response_content) + think_filter.flush()).strip()
 
-    return clean_content
\ No newline at end of file
+    return clean_content
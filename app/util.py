@@ -1,12 +1,57 @@
-import ast
+import asyncio
+from typing import Any, AsyncIterator, Dict, Iterable, List, Set
+from db_pool import QueryResult
 
-def parse_tuple_list(string_representation: str):
-    """Parse string representation of a list of tuples into a Python list."""
+def unique_column_names(columns: Iterable[str]) -> List[str]:
+    """Column names with repeats suffixed (price, price_2, ...), e.g. for self-joins"""
+    names: List[str] = []
+    seen: Set[str] = set()
+    for column in columns:
+        name, suffix = column, 2
+        while name in seen:
+            name = f"{column}_{suffix}"
+            suffix += 1
+        seen.add(name)
+        names.append(name)
+    return names
+
+def rows_as_dicts(result: QueryResult) -> List[Dict[str, Any]]:
+    """Rows keyed by their column names, for prompts and JSON output; repeated names are kept apart"""
+    columns = unique_column_names(result.columns)
+    return [dict(zip(columns, row)) for row in result.rows]
+
+def airlines_in_result(result: QueryResult, valid_airlines: Set[str]) -> Set[str]:
+    """Airline names in a result set, read from any *airline column (or any value if there is none)"""
+    indexes = [i for i, column in enumerate(result.columns) if column.lower().endswith('airline')]
+    if not indexes:
+        indexes = range(len(result.columns))
+    return {row[i] for row in result.rows for i in indexes if row[i] in valid_airlines}
+
+async def merge_streams(*streams: AsyncIterator[Any]) -> AsyncIterator[Any]:
+    """Yield items from several async iterators in the order they are produced"""
+    queue: asyncio.Queue = asyncio.Queue()
+    finished = object()
+
+    async def drain(stream):
+        try:
+            async for item in stream:
+                await queue.put((item, None))
+        except Exception as e:
+            await queue.put((None, e))
+        finally:
+            await queue.put((finished, None))
+
+    tasks = [asyncio.create_task(drain(stream)) for stream in streams]
     try:
-        parsed_data = ast.literal_eval(string_representation)
-        if isinstance(parsed_data, list) and all(isinstance(item, tuple) for item in parsed_data):
-            return parsed_data
-        else:
-            raise ValueError("Invalid format: Expected a list of tuples.")
-    except (SyntaxError, ValueError) as e:
-        raise ValueError(f"Error parsing string: {e}") from e
\ No newline at end of file
+        remaining = len(tasks)
+        while remaining:
+            item, error = await queue.get()
+            if error is not None:
+                raise error
+            if item is finished:
+                remaining -= 1
+                continue
+            yield item
+    finally:
+        for task in tasks:
+            task.cancel()
@@ -1,14 +1,30 @@
+import asyncio
+import hashlib
 import json
 import os
+import re
+import time
+from collections import OrderedDict
 from pathlib import Path
-from typing import List, Dict
-import openai
-import tiktoken
-from config import luggage_llm
+from typing import List, Dict, Optional, Tuple
+import numpy as np
+from config import (
+    get_stage_llm, logger, POLICY_TOP_K, QUERY_EMBEDDING_CACHE_SIZE, EMBEDDING_CACHE_DIR,
+    CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS,
+    LUGGAGE_CACHE_PATH, LUGGAGE_CACHE_MAX_ENTRIES, LUGGAGE_CACHE_TTL_SECONDS
+)
+from chunking import split_documents
+from embeddings import embedder, embed_texts, content_hash, normalize_rows
+from luggage_cache import LuggageAnswerCache, PolicyVersions
 from strip_think_tags import strip_think_tags
 from luggage_prompt import luggage_prompt
 
-client = openai.AsyncOpenAI()
+luggage_answer_cache = LuggageAnswerCache(
+    LUGGAGE_CACHE_PATH,
+    max_entries=LUGGAGE_CACHE_MAX_ENTRIES,
+    ttl=LUGGAGE_CACHE_TTL_SECONDS
+)
+policy_versions = PolicyVersions()
 
 # Usage example:
 documents = [
@@ -31,145 +47,296 @@ def read_file(file_path: str) -> str:
         print(f"Trying to read file at: {absolute_path}")
         raise
 
-def split_document(text: str, max_tokens: int = 500) -> List[str]:
-    # Initialize tokenizer for ada-002
-    enc = tiktoken.encoding_for_model("text-embedding-ada-002")
+async def get_embedding(text: str) -> np.ndarray:
+    return (await embedder.embed([text]))[0]
 
-    chunks = []
-    current_chunk = []
-    current_size = 0
+def _cache_paths(embedding_cache_dir: str, name: str) -> Tuple[str, str]:
+    stem = os.path.join(embedding_cache_dir, f"{name.lower().replace(' ', '_')}_embeddings")
+    return f"{stem}.npy", f"{stem}.meta.json"
 
-    # Split into sentences (basic implementation)
-    sentences = text.replace('\n', ' ').split('. ')
-
-    for sentence in sentences:
-        sentence = sentence.strip() + '. '
-        sentence_tokens = len(enc.encode(sentence))
-
-        if current_size + sentence_tokens > max_tokens:
-            # Join the current chunk and add to chunks
-            chunks.append(''.join(current_chunk))
-            current_chunk = [sentence]
-            current_size = sentence_tokens
-        else:
-            current_chunk.append(sentence)
-            current_size += sentence_tokens
-
-    # Add the last chunk if it exists
-    if current_chunk:
-        chunks.append(''.join(current_chunk))
-
-    return chunks
-
-async def get_embedding(text: str) -> List[float]:
-    response = await client.embeddings.create(
-        model="text-embedding-ada-002",
-        input=text
-    )
-    return response.data[0].embedding
-
-async def process_documents(documents: List[Dict], embedding_cache_dir: str = "./embeddings_cache"):
-    # Create cache directory if it doesn't exist
+def _load_cached_embeddings(embedding_cache_dir: str, name: str) -> Optional[Dict]:
+    """A document's cached chunks and metadata, with the vectors memory-mapped rather than read"""
+    vectors_path, meta_path = _cache_paths(embedding_cache_dir, name)
+    try:
+        with open(meta_path, 'r') as f:
+            cached = json.load(f)
+        cached['embeddings'] = np.load(vectors_path, mmap_mode='r' if cached['chunks'] else None)
+    except (OSError, ValueError, KeyError):
+        return None
+    return cached
+
+def _save_embeddings(embedding_cache_dir: str, name: str, data: Dict) -> None:
+    vectors_path, meta_path = _cache_paths(embedding_cache_dir, name)
+    # Write then rename, so a crash never leaves a sidecar pointing at half-written vectors
+    with open(f"{vectors_path}.tmp", 'wb') as f:
+        np.save(f, np.ascontiguousarray(data['embeddings'], dtype=np.float32))
+    with open(f"{meta_path}.tmp", 'w') as f:
+        json.dump({key: value for key, value in data.items() if key != 'embeddings'}, f)
+    os.replace(f"{vectors_path}.tmp", vectors_path)
+    os.replace(f"{meta_path}.tmp", meta_path)
+
+def _legacy_embeddings(embedding_cache_dir: str, name: str) -> Dict[str, np.ndarray]:
+    """Vectors from the old JSON cache format, reusable when the same model is configured"""
+    legacy_path = os.path.join(embedding_cache_dir, f"{name.lower().replace(' ', '_')}_embeddings.json")
+    if embedder.name != "openai:text-embedding-ada-002" or not os.path.exists(legacy_path):
+        return {}
+    with open(legacy_path, 'r') as f:
+        legacy = json.load(f)
+    vectors = normalize_rows(legacy['embeddings'])
+    return {content_hash(chunk): vector for chunk, vector in zip(legacy['chunks'], vectors)}
+
+async def process_documents(documents: List[Dict], embedding_cache_dir: str = EMBEDDING_CACHE_DIR) -> Dict[str, Dict]:
+    """
+    Chunk embeddings per airline: {'chunks', 'embeddings', 'metadata'}, with 'embeddings' an
+    L2-normalized float32 matrix. Unchanged documents load straight from their .npy cache;
+    for changed ones only chunks whose content hash is unknown are sent to the embedder,
+    batched across all documents.
+    """
     Path(embedding_cache_dir).mkdir(parents=True, exist_ok=True)
 
-    document_chunks = []
-    chunk_embeddings = []
-    chunk_metadata = []
+    results = {}
+    known_vectors: Dict[str, np.ndarray] = {}
+    pending = []
 
     for doc in documents:
-        # Create a unique cache filename for this document
-        cache_filename = f"{doc['name'].lower().replace(' ', '_')}_embeddings.json"
-        cache_path = os.path.join(embedding_cache_dir, cache_filename)
+        cached = _load_cached_embeddings(embedding_cache_dir, doc['name'])
+        if cached is not None and (cached.get('model') != embedder.name
+                                   or cached.get('chunking') != [CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS]):
+            cached = None
+
+        try:
+            text = read_file(doc['policy_file'])
+        except FileNotFoundError:
+            if cached is None:
+                raise
+            text = None
 
-        # Check if we have cached embeddings
-        if os.path.exists(cache_path):
+        source_hash = hashlib.sha256(text.encode('utf-8')).hexdigest() if text is not None else None
+        if cached is not None and (text is None or cached['source_hash'] == source_hash):
             print(f"Loading cached embeddings for {doc['name']}")
-            with open(cache_path, 'r') as f:
-                cached_data = json.load(f)
-                document_chunks.extend(cached_data['chunks'])
-                chunk_embeddings.extend(cached_data['embeddings'])
-                chunk_metadata.extend(cached_data['metadata'])
+            results[doc['name']] = cached
+            continue
+
+        # The previous version of the document still holds vectors for its unchanged chunks
+        if cached is not None:
+            known_vectors.update(zip(cached['chunk_hashes'], cached['embeddings']))
         else:
-            print(f"Creating new embeddings for {doc['name']}")
-            # Read and process the document
-            text = read_file(doc['policy_file'])
-            doc_chunks = split_document(text)
-
-            # Store new chunks and their metadata
-            doc_embeddings = []
-            doc_metadata = []
-
-            for i, chunk in enumerate(doc_chunks):
-                embedding = await get_embedding(chunk)
-                doc_embeddings.append(embedding)
-                doc_metadata.append({
-                    "airline": doc["name"],
-                    "chunk_index": i,
-                    "total_chunks": len(doc_chunks)
-                })
-
-            # Save to cache
-            cache_data = {
-                'chunks': doc_chunks,
-                'embeddings': doc_embeddings,
-                'metadata': doc_metadata
-            }
-            with open(cache_path, 'w') as f:
-                json.dump(cache_data, f)
-
-            # Add to our current results
-            document_chunks.extend(doc_chunks)
-            chunk_embeddings.extend(doc_embeddings)
-            chunk_metadata.extend(doc_metadata)
-
-    return {
-        'chunks': document_chunks,
-        'embeddings': chunk_embeddings,
-        'metadata': chunk_metadata
-    }
-
-async def generate_llm_response(airline: str, query: str, relevant_text: str) -> str:
+            known_vectors.update(_legacy_embeddings(embedding_cache_dir, doc['name']))
+
+        pending.append((doc, text, source_hash))
+
+    # Changed documents are tokenized together, then only unseen chunks are embedded
+    chunk_lists = split_documents([text for _, text, _ in pending])
+    pending = [(doc, chunks, [content_hash(chunk) for chunk in chunks], source_hash)
+               for (doc, _, source_hash), chunks in zip(pending, chunk_lists)]
+
+    missing = {chunk_hash: chunk
+               for _, chunks, chunk_hashes, _ in pending
+               for chunk, chunk_hash in zip(chunks, chunk_hashes)
+               if chunk_hash not in known_vectors}
+    if missing:
+        print(f"Creating new embeddings for {len(missing)} chunks")
+        vectors = await embed_texts(list(missing.values()))
+        known_vectors.update(zip(missing.keys(), vectors))
+
+    for doc, chunks, chunk_hashes, source_hash in pending:
+        data = {
+            'model': embedder.name,
+            'source_hash': source_hash,
+            'chunking': [CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS],
+            'chunks': chunks,
+            'chunk_hashes': chunk_hashes,
+            'metadata': [
+                {"airline": doc["name"], "chunk_index": i, "total_chunks": len(chunks)}
+                for i in range(len(chunks))
+            ],
+            'embeddings': (np.vstack([known_vectors[chunk_hash] for chunk_hash in chunk_hashes])
+                           if chunk_hashes else np.zeros((0, 0), dtype=np.float32))
+        }
+        _save_embeddings(embedding_cache_dir, doc['name'], data)
+        results[doc['name']] = _load_cached_embeddings(embedding_cache_dir, doc['name']) or data
+
+    return results
+
+async def generate_llm_response(airline: str, query: str, relevant_text: str,
+                                policy_version: Optional[str] = None) -> str:
     prompt = luggage_prompt.format(airline=airline, query=query, relevant_text=relevant_text)
 
     try:
-        response = await luggage_llm.ainvoke(prompt)
-        return strip_think_tags(response).strip()
+        response = await get_stage_llm('luggage').ainvoke(prompt)
+        answer = strip_think_tags(response).strip()
     except Exception:
         # Fallback to a basic response if LLM fails
         return f"According to {airline}'s policy: {relevant_text}"
 
-def search_policy(airline: str, query: str) -> str:
-    policy_file = next((doc["policy_file"] for doc in documents
-                       if doc["name"].lower() == airline.lower()), None)
-
-    script_dir = Path(__file__).parent.absolute()
-    absolute_path = os.path.join(script_dir, policy_file)
-
-    if not policy_file:
+    # Only real LLM answers are remembered, never the fallback
+    if policy_version:
+        await asyncio.to_thread(luggage_answer_cache.put, airline, query, policy_version, answer)
+    return answer
+
+class PolicyIndex:
+    """
+    In-memory policy retrieval: each airline's chunk embeddings live in one contiguous,
+    L2-normalized float32 matrix (memory-mapped from the .npy cache), so a top-k lookup is a single matrix-vector product.
+    Query embeddings are cached, and policy text is read from disk once per policy version.
+    Airlines without embeddings (or an unavailable embedding API) fall back to keyword scoring.
+    """
+
+    RETRY_AFTER_SECONDS = 60
+
+    def __init__(self, policy_documents: List[Dict], top_k: int = 3, query_cache_size: int = 1024):
+        self.documents = {doc["name"].lower(): doc for doc in policy_documents}
+        self.top_k = top_k
+        self.query_cache_size = query_cache_size
+        self.matrices: Dict[str, np.ndarray] = {}
+        self.chunks: Dict[str, List[str]] = {}
+        self._texts: Dict[str, Optional[str]] = {}
+        # Policy version each airline's text and matrix were loaded from
+        self.versions: Dict[str, Optional[str]] = {}
+        self._query_embeddings: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._loaded = False
+        self._failed_at: Optional[float] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    async def load(self) -> None:
+        """Build the per-airline matrices once, from the embeddings cache when available"""
+        if self._loaded:
+            return
+        if self._failed_at is not None and time.monotonic() - self._failed_at < self.RETRY_AFTER_SECONDS:
+            return
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            if self._loaded:
+                return
+            try:
+                processed = await process_documents(list(self.documents.values()))
+            except Exception as e:
+                self._failed_at = time.monotonic()
+                logger.warning("Policy embeddings unavailable, using keyword search: %s", e)
+                return
+
+            self._store(processed)
+            self._loaded = True
+
+    def _store(self, processed: Dict[str, Dict]) -> None:
+        for name, processed_doc in processed.items():
+            self.matrices[name.lower()] = processed_doc["embeddings"]
+            self.chunks[name.lower()] = processed_doc["chunks"]
+            self.versions[name.lower()] = policy_versions.get(self.policy_path(name))
+
+    async def ensure_current(self, airline: str, version: Optional[str]) -> None:
+        """Reload an airline's text and embeddings if its policy file changed since they were loaded"""
+        key = airline.lower()
+        if version is None or self.versions.get(key) == version:
+            return
+        await self.load()
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+
+        async with self._lock:
+            if self.versions.get(key) == version:
+                return
+            self._texts.pop(key, None)
+            if self._loaded:
+                try:
+                    # Only the chunks that changed are embedded again
+                    self._store(await process_documents([self.documents[key]]))
+                except Exception as e:
+                    logger.warning("Re-embedding %s's policy failed, using keyword search: %s", airline, e)
+                    self.matrices.pop(key, None)
+                    self.chunks.pop(key, None)
+            self.versions[key] = version
+
+    async def embed_query(self, query: str) -> np.ndarray:
+        key = " ".join(query.lower().split())
+        cached = self._query_embeddings.get(key)
+        if cached is not None:
+            self._query_embeddings.move_to_end(key)
+            return cached
+
+        vector = normalize_rows(await get_embedding(key))
+        self._query_embeddings[key] = vector
+        if len(self._query_embeddings) > self.query_cache_size:
+            self._query_embeddings.popitem(last=False)
+        return vector
+
+    def policy_path(self, airline: str) -> Optional[str]:
+        doc = self.documents.get(airline.lower())
+        if not doc:
+            return None
+        return os.path.join(Path(__file__).parent.absolute(), doc["policy_file"])
+
+    def policy_text(self, airline: str) -> Optional[str]:
+        key = airline.lower()
+        if key not in self._texts:
+            doc = self.documents.get(key)
+            try:
+                self._texts[key] = read_file(doc["policy_file"]) if doc else None
+            except FileNotFoundError:
+                self._texts[key] = None
+        return self._texts[key]
+
+    def keyword_search(self, airline: str, query: str) -> List[str]:
+        """Sections sharing the most query keywords, in document order among equals"""
+        policy_text = self.policy_text(airline) or ""
+        query_keywords = set(re.findall(r"\w+", query.lower()))
+        scored = []
+        for position, section in enumerate(policy_text.split("\n\n")):
+            section_words = set(re.findall(r"\w+", section.lower()))
+            score = len(query_keywords & section_words)
+            if score:
+                scored.append((-score, position, section))
+        return [section for _, _, section in sorted(scored)[:self.top_k]]
+
+    async def search(self, airline: str, query: str) -> List[str]:
+        """Top-k policy chunks for the query by cosine similarity, or by keywords as a fallback"""
+        await self.load()
+        matrix = self.matrices.get(airline.lower())
+        if matrix is not None and len(matrix):
+            try:
+                scores = matrix @ await self.embed_query(query)
+            except Exception as e:
+                logger.warning("Query embedding failed, using keyword search: %s", e)
+            else:
+                k = min(self.top_k, len(scores))
+                top = np.argpartition(-scores, k - 1)[:k]
+                top = top[np.argsort(-scores[top])]
+                return [self.chunks[airline.lower()][i] for i in top]
+        return self.keyword_search(airline, query)
+
+policy_index = PolicyIndex(documents, top_k=POLICY_TOP_K, query_cache_size=QUERY_EMBEDDING_CACHE_SIZE)
+
+async def search_policy(airline: str, query: str) -> str:
+    if airline.lower() not in policy_index.documents:
         return f"I apologize, but I don't have any policy information available for {airline}."
 
-    try:
-        with open(absolute_path, 'r', encoding='utf-8') as file:
-            policy_text = file.read()
-    except FileNotFoundError:
+    if policy_index.policy_text(airline) is None and airline.lower() not in policy_index.matrices:
         return f"I apologize, but I couldn't find the policy document for {airline}."
 
-    query_keywords = query.lower().split()
-
-    # Searching for the most relevant section
-    sections = policy_text.split("\n\n")
-    relevant_sections = []
+    # Repeat questions about an unchanged policy skip retrieval and the local LLM
+    policy_version = policy_versions.get(policy_index.policy_path(airline))
+    if policy_version:
+        cached_answer = await asyncio.to_thread(luggage_answer_cache.get, airline, query, policy_version)
+        if cached_answer is not None:
+            return cached_answer
 
-    for section in sections:
-        if any(keyword in section.lower() for keyword in query_keywords):
-            relevant_sections.append(section)
+    # The answer is cached under this version, so it must come from this version's text
+    await policy_index.ensure_current(airline, policy_version)
+    relevant_sections = await policy_index.search(airline, query)
 
     if relevant_sections:
-        relevant_text = "\n\n".join(relevant_sections[:3])
-        return generate_llm_response(airline, query, relevant_text)
+        relevant_text = "\n\n".join(relevant_sections)
+        return await generate_llm_response(airline, query, relevant_text, policy_version)
     else:
-        return generate_llm_response(
+        return await generate_llm_response(
             airline,
             query,
-            "No specific information found in the policy document."
-        )
\ No newline at end of file
+            "No specific information found in the policy document.",
+            policy_version
+        )
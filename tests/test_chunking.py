@@ -0,0 +1,62 @@
+import pytest
+import tiktoken
+
+import chunking
+from chunking import section_spans, split_document, split_documents
+
+
+@pytest.fixture(autouse=True)
+def byte_encoder(monkeypatch):
+    # One token per byte, so the tests run offline without downloading BPE ranks
+    encoder = tiktoken.Encoding(
+        name="bytes", pat_str=r"\S+|\s+", mergeable_ranks={bytes([i]): i for i in range(256)}, special_tokens={}
+    )
+    monkeypatch.setattr(chunking, "get_encoder", lambda model=None: encoder)
+    return encoder
+
+
+POLICY = (
+    "Cabin Baggage\n\n"
+    "One bag up to 7 kg is allowed.\n\n"
+    "Checked Baggage\n\n"
+    "Economy fares include 15 kg. Business fares include 30 kg."
+)
+
+
+def test_section_spans_group_headings_with_their_paragraphs():
+    sections = [POLICY[start:end] for start, _, end in section_spans(POLICY)]
+    assert sections == [
+        "Cabin Baggage\n\nOne bag up to 7 kg is allowed.",
+        "Checked Baggage\n\nEconomy fares include 15 kg. Business fares include 30 kg.",
+    ]
+
+
+def test_small_sections_are_packed_together():
+    assert split_document(POLICY, max_tokens=500, overlap=0) == [POLICY]
+    assert split_document(POLICY, max_tokens=80, overlap=0) == [
+        "Cabin Baggage\n\nOne bag up to 7 kg is allowed.",
+        "Checked Baggage\n\nEconomy fares include 15 kg. Business fares include 30 kg.",
+    ]
+
+
+def test_oversized_sections_are_windowed_at_sentence_ends_with_their_heading(byte_encoder):
+    body = " ".join(f"Rule {i} applies to every passenger." for i in range(12))
+    text = f"Excess Fees\n\n{body}"
+    chunks = split_document(text, max_tokens=120, overlap=20)
+
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert chunk.startswith("Excess Fees\n\n")
+        assert chunk.endswith(".")
+        assert len(byte_encoder.encode(chunk)) <= 120 + 2
+    # Each window repeats the last `overlap` tokens of the one before, and together they cover every rule
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk[len("Excess Fees\n\n"):].startswith(previous[-19:])
+    assert all(f"Rule {i} " in "".join(chunks) for i in range(12))
+
+
+def test_batch_mode_matches_streaming_mode():
+    texts = [POLICY, "Prohibited Items\n\nPower banks must be carried in the cabin."]
+    assert split_documents(texts, max_tokens=80, overlap=10) == [
+        split_document(text, max_tokens=80, overlap=10) for text in texts
+    ]
@@ -0,0 +1,57 @@
+import pytest
+
+from clean_sql_query import canonical_sql, clean_sql_query, sql_fingerprint
+from sql_tokenizer import string_value, tokenize
+
+
+def test_fences_markers_and_comments_are_dropped():
+    raw = "```sql\nselect id -- the id\nfrom flights /* all */ limit 5;\n```<|END_RESPONSE|>"
+    assert clean_sql_query(raw) == "SELECT id FROM flights LIMIT 5;"
+
+
+def test_bind_parameters_are_kept():
+    raw = "select * from flights where origin = :origin and flight_date = :departure_date limit :limit"
+    assert clean_sql_query(raw) == (
+        "SELECT * FROM flights WHERE origin = :origin AND flight_date = :departure_date LIMIT :limit"
+    )
+
+
+@pytest.mark.parametrize("literal", [
+    "'from -- not a comment'",
+    "'select :origin, ```'",
+    "'two  spaces,and a comma'",
+    "'O''Hare'",
+])
+def test_string_literals_are_left_untouched(literal):
+    assert clean_sql_query(f"select {literal} from flights") == f"SELECT {literal} FROM flights"
+
+
+def test_quoted_identifiers_keep_their_case():
+    assert clean_sql_query('select "Price Inr", `from` from flights') == 'SELECT "Price Inr", `from` FROM flights'
+
+
+def test_commas_get_one_space():
+    assert clean_sql_query("select id,airline ,  price_inr from flights") == (
+        "SELECT id, airline, price_inr FROM flights"
+    )
+
+
+def test_non_strings_clean_to_empty():
+    assert clean_sql_query(None) == ""
+
+
+def test_layout_and_identifier_case_share_a_fingerprint():
+    a = "SELECT Price_INR FROM Flights WHERE origin = 'Hanoi';"
+    b = "select price_inr\n  from flights -- cheapest\n where ORIGIN = 'Hanoi'"
+    assert canonical_sql(a) == canonical_sql(b)
+    assert sql_fingerprint(a) == sql_fingerprint(b)
+    assert sql_fingerprint(a) != sql_fingerprint(a.replace("'Hanoi'", "'hanoi'"))
+
+
+def test_tokenizer_kinds_and_unterminated_strings():
+    tokens = tokenize("SELECT a, :p FROM t WHERE b >= 1.5 AND c = 'it''s")
+    assert [kind for kind, _ in tokens] == [
+        'word', 'word', 'op', 'param', 'word', 'word', 'word', 'word', 'op', 'number',
+        'word', 'word', 'op', 'string'
+    ]
+    assert string_value(tokens[-1]) == "it's"
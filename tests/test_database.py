@@ -0,0 +1,68 @@
+import json
+import sqlite3
+
+import pytest
+
+from database import get_data_version, get_schema_version, json_to_sqlite, parse_duration_minutes
+
+
+def _fare(time, price, **overrides):
+    fare = dict(airline="IndiGo", time=time, date="2025-01-12", duration=None, flightType="Nonstop",
+                price_inr=price, origin="New Delhi", destination="Hanoi",
+                originCountry="India", destinationCountry="Vietnam")
+    fare.update(overrides)
+    return fare
+
+
+def test_reloading_rows_with_null_key_values_updates_in_place(tmp_path):
+    dump, db = tmp_path / "flights.json", tmp_path / "flights.db"
+    dump.write_text(json.dumps([_fare("10:00", 100), _fare("11:00", 200), _fare("12:00", 300)]))
+
+    json_to_sqlite(dump, db)
+    json_to_sqlite(dump, db)
+
+    conn = sqlite3.connect(db)
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM flights").fetchone() == (3,)
+        assert conn.execute(
+            "SELECT min_price_inr, median_price_inr, max_price_inr, flight_count FROM route_fare_summary"
+        ).fetchall() == [(100, 200, 300, 3)]
+    finally:
+        conn.close()
+
+
+def test_reload_keeps_the_schema_version_and_bumps_the_data_version(tmp_path):
+    dump, db = tmp_path / "flights.json", tmp_path / "flights.db"
+    dump.write_text(json.dumps([_fare("10:00", 100), _fare("11:00", 200)]))
+    json_to_sqlite(dump, db)
+    schema_version, data_version = get_schema_version(db), get_data_version(db)
+
+    dump.write_text(json.dumps([_fare("10:00", 150), _fare("13:00", 400)]))
+    json_to_sqlite(dump, db)
+
+    assert get_schema_version(db) == schema_version
+    assert get_data_version(db) == data_version + 1
+    conn = sqlite3.connect(db)
+    try:
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert "idx_flights_route_date" in indexes
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize("value, minutes", [
+    ("2h 30m", 150),
+    ("Duration: 2h 30m", 150),
+    ("5 hr 30 min", 330),
+    ("1 day 2h", 1560),
+    ("05:30", 330),
+    ("PT5H30M", 330),
+    ("45m", 45),
+])
+def test_parse_duration_minutes(value, minutes):
+    assert parse_duration_minutes(value) == minutes
+
+
+@pytest.mark.parametrize("value", [None, "", "unknown", "Duration: n/a"])
+def test_parse_duration_minutes_without_a_duration(value):
+    assert parse_duration_minutes(value) is None
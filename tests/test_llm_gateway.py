@@ -0,0 +1,146 @@
+import asyncio
+
+import pytest
+
+import llm_gateway
+from llm_gateway import (
+    GatewayLLM, LLMOverloadedError, ProviderGate, TokenBucket,
+    PRIORITY_ANSWER, PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE
+)
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+class FakeLLM:
+    """Fails with the given statuses in turn, then answers"""
+
+    def __init__(self, failures=()):
+        self.failures = list(failures)
+        self.calls = 0
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        self.calls += 1
+        if self.failures:
+            raise StatusError(self.failures.pop(0))
+        return "ok"
+
+    async def astream(self, input, config=None, **kwargs):
+        self.calls += 1
+        yield "first"
+        if self.failures:
+            raise StatusError(self.failures.pop(0))
+        yield "second"
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+
+    async def fake_sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(llm_gateway.asyncio, "sleep", fake_sleep)
+    monkeypatch.setattr(llm_gateway.random, "random", lambda: 0.5)
+    return delays
+
+
+def test_token_bucket_lends_ahead_and_reports_the_wait(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(llm_gateway.time, "monotonic", lambda: now[0])
+    bucket = TokenBucket(per_minute=60)
+    assert bucket.reserve(60) == 0.0
+    assert bucket.reserve(2) == pytest.approx(2.0)
+    now[0] += 5
+    assert bucket.reserve(1) == 0.0
+    # A request larger than the bucket only ever waits for a full bucket
+    assert bucket.reserve(1000) == pytest.approx(58.0)
+    assert TokenBucket(per_minute=None).reserve(10 ** 6) == 0.0
+
+
+def test_waiters_are_admitted_by_priority_then_arrival():
+    async def main():
+        gate = ProviderGate("test", max_concurrency=1, max_queue=8)
+        order = []
+
+        async def call(name, priority):
+            async with gate.admit(priority, 0):
+                order.append(name)
+                await asyncio.sleep(0)
+
+        async with gate.admit(PRIORITY_INTERACTIVE, 0):
+            tasks = [asyncio.create_task(call(name, priority)) for name, priority in [
+                ("background", PRIORITY_BACKGROUND), ("interactive", PRIORITY_INTERACTIVE),
+                ("answer", PRIORITY_ANSWER), ("answer 2", PRIORITY_ANSWER)]]
+            await asyncio.sleep(0)
+            assert gate.queued == 4
+        await asyncio.gather(*tasks)
+        return gate, order
+
+    gate, order = asyncio.run(main())
+    assert order == ["answer", "answer 2", "interactive", "background"]
+    assert (gate.active, gate.queued) == (0, 0)
+
+
+def test_a_full_queue_rejects_with_its_depth():
+    async def main():
+        gate = ProviderGate("test", max_concurrency=1, max_queue=1)
+        async with gate.admit(PRIORITY_INTERACTIVE, 0):
+            waiting = asyncio.create_task(gate.admit(PRIORITY_INTERACTIVE, 0).__aenter__())
+            await asyncio.sleep(0)
+            with pytest.raises(LLMOverloadedError) as rejected:
+                async with gate.admit(PRIORITY_ANSWER, 0):
+                    pass
+            waiting.cancel()
+        return gate, rejected.value
+
+    gate, error = asyncio.run(main())
+    assert (error.provider, error.queue_depth, gate.rejected) == ("test", 1, 1)
+
+
+def test_retryable_errors_back_off_exponentially(sleeps):
+    llm = FakeLLM(failures=[503, 429])
+    gateway = GatewayLLM(llm, ProviderGate("test"), max_retries=3)
+    assert asyncio.run(gateway.ainvoke("hi")) == "ok"
+    assert llm.calls == 3 and gateway.gate.retries == 2
+    assert sleeps == [1.0, 2.0]
+    assert gateway.gate.active == 0
+
+
+def test_repeated_429s_surface_as_overloaded(sleeps):
+    gateway = GatewayLLM(FakeLLM(failures=[429] * 5), ProviderGate("test"), max_retries=2)
+    with pytest.raises(LLMOverloadedError):
+        asyncio.run(gateway.ainvoke("hi"))
+    assert gateway.llm.calls == 3 and len(sleeps) == 2
+
+
+def test_client_errors_are_not_retried(sleeps):
+    gateway = GatewayLLM(FakeLLM(failures=[400]), ProviderGate("test"))
+    with pytest.raises(StatusError):
+        asyncio.run(gateway.ainvoke("hi"))
+    assert gateway.llm.calls == 1 and sleeps == []
+
+
+def test_retry_after_header_wins_over_backoff(sleeps):
+    class Response:
+        headers = {"retry-after": "7"}
+
+    error = StatusError(429)
+    error.response = Response()
+    gateway = GatewayLLM(FakeLLM(), ProviderGate("test"))
+    asyncio.run(gateway._backoff(error, 0))
+    assert sleeps == [7.0]
+
+
+def test_a_stream_is_not_retried_after_it_produced_output(sleeps):
+    async def collect(gateway):
+        return [chunk async for chunk in gateway.astream("hi")]
+
+    gateway = GatewayLLM(FakeLLM(failures=[503]), ProviderGate("test"))
+    with pytest.raises(StatusError):
+        asyncio.run(collect(gateway))
+    assert gateway.llm.calls == 1 and sleeps == []
+    assert gateway.gate.active == 0
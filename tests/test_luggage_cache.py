@@ -0,0 +1,24 @@
+from luggage_cache import LuggageAnswerCache, normalize_luggage_query
+
+
+def test_rephrasings_share_a_key_but_distinct_questions_do_not():
+    assert normalize_luggage_query("What is the cabin bag allowance?") == \
+        normalize_luggage_query("  cabin   bag ALLOWANCE ")
+    assert normalize_luggage_query("How many cabin bags can I bring?") != \
+        normalize_luggage_query("What are the cabin bag dimensions?")
+    assert normalize_luggage_query("Are power banks allowed?") != \
+        normalize_luggage_query("Are power banks not allowed?")
+
+
+def test_answers_are_scoped_to_the_policy_version(tmp_path):
+    cache = LuggageAnswerCache(str(tmp_path / "luggage.db"))
+    try:
+        cache.put("IndiGo", "Cabin bag allowance?", "v1", "7 kg")
+        assert cache.get("IndiGo", "what is the cabin bag allowance", "v1") == "7 kg"
+        assert cache.get("IndiGo", "excess baggage fee", "v1") is None
+        assert cache.get("IndiGo", "cabin bag allowance", "v2") is None
+        # The old version's answers are purged once a newer policy is seen
+        assert cache.get("IndiGo", "cabin bag allowance", "v1") is None
+        assert (cache.hits, cache.misses) == (1, 3)
+    finally:
+        cache.close()
@@ -0,0 +1,43 @@
+from difflib import get_close_matches
+
+import pytest
+
+from query_validator import (
+    FLIGHT_KEYWORDS, LUGGAGE_KEYWORDS, KeywordIndex, classify_query, edit_distance
+)
+
+
+@pytest.mark.parametrize("query, flight, luggage", [
+    ("cheapest flihgt from Mumbai to Delhi next friday", True, False),
+    ("What is the carry on allowance for IndiGo?", False, True),
+    ("how much does an overwieght bag cost", True, True),
+    ("Can I bring a power bank in my carryon?", False, True),
+    ("fares under ₹5000", True, False),
+    ("tell me a joke about cats", False, False),
+])
+def test_classify_query(query, flight, luggage):
+    assert classify_query(query) == (flight, luggage)
+
+
+def test_short_words_need_an_exact_match():
+    index = KeywordIndex({"flight": {"air"}})
+    assert index.labels("air") == {"flight"}
+    assert index.labels("aim") == frozenset()
+
+
+def test_phrases_match_as_ngrams_of_corrected_words():
+    index = KeywordIndex({"luggage": {"hand baggage"}})
+    assert index.labels("my hnad bagage please") == {"luggage"}
+    assert index.labels("hand over the baggage") == frozenset()
+
+
+def test_adjacent_swaps_count_as_one_edit():
+    assert edit_distance("flihgt", "flight", 1) == 1
+    assert edit_distance("abcdef", "badcfe", 2) == 3
+
+
+@pytest.mark.parametrize("word", ["flgiht", "airlnie", "priec", "lugage", "allowence", "prohibted", "sutcase"])
+def test_typos_difflib_accepts_are_corrected(word):
+    vocabulary = set(FLIGHT_KEYWORDS) | set(LUGGAGE_KEYWORDS)
+    assert get_close_matches(word, vocabulary, n=1, cutoff=0.75)
+    assert classify_query(word) != (False, False)
@@ -0,0 +1,66 @@
+import asyncio
+
+from db_pool import QueryResult
+from result_cache import ResultCache, result_size
+
+SQL = "SELECT * FROM flights WHERE origin = :origin"
+
+
+def versioned_cache(versions, **kwargs):
+    async def version_source():
+        return versions[-1]
+    return ResultCache(version_source=version_source, **kwargs)
+
+
+def test_results_are_keyed_on_fingerprint_and_parameters():
+    cache = ResultCache()
+    result = QueryResult(("id",), [(1,)])
+    cache.put(SQL, {"origin": "Hanoi"}, result)
+    assert cache.get("select *  from flights where origin = :origin", {"origin": "Hanoi"}) is result
+    assert cache.get(SQL, {"origin": "Mumbai"}) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_a_new_data_version_drops_cached_results():
+    versions = [1]
+    cache = versioned_cache(versions, version_check_interval=3600)
+    asyncio.run(cache.refresh_version())
+    cache.put(SQL, None, QueryResult(("id",), [(1,)]))
+
+    versions.append(2)
+    asyncio.run(cache.refresh_version())
+    assert cache.get(SQL) is not None  # not re-read within the check interval
+
+    cache.invalidate()
+    asyncio.run(cache.refresh_version())
+    assert cache.data_version == 2
+    assert cache.get(SQL) is None and len(cache) == 0
+
+
+def test_results_of_a_query_that_raced_a_reload_are_not_stored():
+    versions = [1]
+    cache = versioned_cache(versions, version_check_interval=0)
+    asyncio.run(cache.refresh_version())
+    seen_before_query = cache.data_version
+    versions.append(2)
+    asyncio.run(cache.refresh_version())
+    cache.put(SQL, None, QueryResult(("id",), [(1,)]), seen_before_query)
+    assert len(cache) == 0
+
+
+def test_least_recently_used_results_are_evicted_by_size():
+    result = QueryResult(("id",), [(i,) for i in range(10)])
+    cache = ResultCache(max_bytes=2 * result_size(result))
+    cache.put("SELECT 0", None, result)
+    cache.put("SELECT 1", None, result)
+    cache.get("SELECT 0")
+    cache.put("SELECT 2", None, result)
+    assert cache.get("SELECT 1") is None
+    assert cache.get("SELECT 0") is not None and cache.get("SELECT 2") is not None
+    assert cache.evictions == 1 and cache.bytes <= cache.max_bytes
+
+
+def test_oversized_results_are_not_stored():
+    cache = ResultCache(max_entry_bytes=10)
+    cache.put(SQL, None, QueryResult(("id",), [(1,)]))
+    assert len(cache) == 0
@@ -0,0 +1,80 @@
+import asyncio
+
+from single_flight import SingleFlight
+
+
+def counted_stream(calls, events, delay=0.01, cancelled=None):
+    async def factory():
+        calls.append(1)
+        try:
+            for event in events:
+                await asyncio.sleep(delay)
+                yield event
+        except asyncio.CancelledError:
+            if cancelled is not None:
+                cancelled.append(True)
+            raise
+    return factory
+
+
+async def collect(stream, limit=None):
+    items = []
+    async for item in stream:
+        items.append(item)
+        if limit is not None and len(items) == limit:
+            break
+    return items
+
+
+def test_concurrent_callers_share_one_run():
+    async def main():
+        flights, calls = SingleFlight(), []
+        factory = counted_stream(calls, ["a", "b", "c"])
+        first = asyncio.create_task(collect(flights.stream("q", factory)))
+        await asyncio.sleep(0.015)
+        # A late joiner replays what it missed
+        second = asyncio.create_task(collect(flights.stream("q", factory)))
+        results = await asyncio.gather(first, second)
+        return flights, calls, results
+
+    flights, calls, results = asyncio.run(main())
+    assert results == [["a", "b", "c"], ["a", "b", "c"]]
+    assert len(calls) == 1 and (flights.leaders, flights.coalesced) == (1, 1)
+    assert len(flights) == 0
+
+
+def test_a_finished_flight_is_not_reused():
+    async def main():
+        flights, calls = SingleFlight(), []
+        factory = counted_stream(calls, ["a"], delay=0)
+        await collect(flights.stream("q", factory))
+        await collect(flights.stream("q", factory))
+        return calls
+
+    assert len(asyncio.run(main())) == 2
+
+
+def test_work_is_cancelled_once_every_subscriber_leaves():
+    async def main():
+        flights, calls, cancelled = SingleFlight(), [], []
+        factory = counted_stream(calls, ["a", "b", "c"], cancelled=cancelled)
+        stream = flights.stream("q", factory)
+        assert await collect(stream, limit=1) == ["a"]
+        await stream.aclose()
+        await asyncio.sleep(0.05)
+        return flights, cancelled
+
+    flights, cancelled = asyncio.run(main())
+    assert cancelled == [True] and len(flights) == 0
+
+
+def test_a_failing_leader_ends_every_subscriber_stream():
+    async def failing():
+        yield "a"
+        raise RuntimeError("boom")
+
+    async def main():
+        flights = SingleFlight()
+        return await asyncio.gather(collect(flights.stream("q", failing)), collect(flights.stream("q", failing)))
+
+    assert asyncio.run(main()) == [["a"], ["a"]]
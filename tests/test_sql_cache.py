@@ -0,0 +1,48 @@
+import sql_cache
+from sql_cache import SQLCache, normalize_question
+
+SQL = "SELECT * FROM flights WHERE origin = 'Mumbai' AND destination = 'Hanoi'"
+
+
+def test_aliases_case_and_punctuation_share_an_entry():
+    assert normalize_question("  Flights from BOMBAY to Hanoi?? ") == "flights from mumbai to hanoi"
+    cache = SQLCache()
+    cache.put("Flights from Bombay to Hanoi?", SQL, schema_version=1)
+    assert cache.get("flights from mumbai to hanoi", schema_version=1) == SQL
+    assert (cache.hits, cache.misses) == (1, 0)
+
+
+def test_a_schema_change_drops_every_entry():
+    cache = SQLCache()
+    cache.put("flights from mumbai to hanoi", SQL, schema_version=1)
+    assert cache.get("flights from mumbai to hanoi", schema_version=2) is None
+    assert len(cache) == 0
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(sql_cache.time, "monotonic", lambda: now[0])
+    cache = SQLCache(ttl=60)
+    cache.put("flights from mumbai to hanoi", SQL)
+    now[0] += 61
+    assert cache.get("flights from mumbai to hanoi") is None
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SQLCache(max_entries=2)
+    cache.put("flights from mumbai to hanoi", "a")
+    cache.put("flights from mumbai to da nang", "b")
+    cache.get("flights from mumbai to hanoi")
+    cache.put("flights from mumbai to phu quoc", "c")
+    assert cache.get("flights from mumbai to da nang") is None
+    assert cache.get("flights from mumbai to hanoi") == "a"
+
+
+def test_similar_questions_must_agree_on_every_entity():
+    cache = SQLCache(similarity_threshold=0.8)
+    cache.put("show me flights from mumbai to hanoi under 5000", SQL)
+    assert cache.get("show flights from mumbai to hanoi under 5000") == SQL
+    assert cache.similar_hits == 1
+    assert cache.get("show me flights from mumbai to hanoi under 6000") is None
+    assert cache.get("show me flights from mumbai to da nang under 5000") is None
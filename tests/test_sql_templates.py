@@ -0,0 +1,106 @@
+import sqlite3
+from datetime import date
+
+import pytest
+
+from sql_templates import inline_params, match_template, parse_flight_search, render_flight_search
+
+TODAY = date(2025, 1, 1)
+
+
+def parse(question):
+    return parse_flight_search(question, today=TODAY)
+
+
+def test_route_date_and_price_order():
+    intent = parse("cheapest flights from delhi to hanoi on 12 jan")
+    assert (intent.origin, intent.destination) == ("New Delhi", "Hanoi")
+    assert intent.departure_date == "2025-01-12"
+    assert intent.sort == "price_asc"
+    assert not intent.round_trip and not intent.direct_only
+
+
+@pytest.mark.parametrize("question", [
+    "first flight from delhi to hanoi on 12 jan",
+    "best flight from delhi to hanoi",
+    "top flights from delhi to hanoi",
+    "flights from delhi to hanoi sorted by date",
+    "flights from delhi to hanoi in the evening",
+    "flights from mumbai to delhi",
+])
+def test_questions_the_templates_cannot_express_fall_through(question):
+    assert parse(question) is None
+
+
+def test_limit_direct_and_descending_price():
+    intent = parse("5 most expensive direct flights from hanoi to mumbai")
+    assert (intent.origin, intent.destination) == ("Hanoi", "Mumbai")
+    assert (intent.limit, intent.direct_only, intent.sort) == (5, True, "price_desc")
+
+
+def test_destination_named_first():
+    intent = parse("flights to hanoi from delhi")
+    assert (intent.origin, intent.destination) == ("New Delhi", "Hanoi")
+
+
+def test_round_trip_needs_two_dates():
+    intent = parse("round trip from delhi to hanoi on 12 jan returning on 15 jan")
+    assert intent.round_trip
+    assert (intent.departure_date, intent.return_date) == ("2025-01-12", "2025-01-15")
+    assert parse("round trip from delhi to hanoi on 12 jan") is None
+
+
+def test_fare_calendar_month_range():
+    intent = parse("which day is cheapest to fly from delhi to hanoi in february")
+    assert intent.calendar
+    assert (intent.date_from, intent.date_to) == ("2025-02-01", "2025-02-28")
+    sql, params = render_flight_search(intent)
+    assert "FROM route_fare_summary" in sql
+    assert params["date_from"] == "2025-02-01"
+
+
+def test_rendered_query_runs_with_bind_parameters():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE flights (id INTEGER PRIMARY KEY, airline TEXT, time TEXT, date TEXT, "
+                 "duration TEXT, flightType TEXT, price_inr INTEGER, origin TEXT, destination TEXT, "
+                 "flight_date TEXT)")
+    conn.executemany(
+        "INSERT INTO flights (airline, time, date, duration, flightType, price_inr, origin, destination, flight_date) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        [("IndiGo", "10:00", "12 Jan 2025", "5h", "Nonstop", 9000, "New Delhi", "Hanoi", "2025-01-12"),
+         ("VietJet Air", "11:00", "12 Jan 2025", "7h", "1 stop", 7000, "New Delhi", "Hanoi", "2025-01-12"),
+         ("IndiGo", "10:00", "13 Jan 2025", "5h", "Nonstop", 5000, "New Delhi", "Hanoi", "2025-01-13")],
+    )
+    sql, params = render_flight_search(parse("cheapest flights from delhi to hanoi on 12 jan"))
+    assert [row[6] for row in conn.execute(sql, params)] == [7000, 9000]
+
+
+def test_dated_templates_wait_for_the_flight_date_column():
+    legacy = {"flights": {"id", "airline", "date", "price_inr", "origin", "destination"}}
+    typed = {"flights": legacy["flights"] | {"flight_date"}}
+    question = "flights from delhi to hanoi on 12 jan"
+    assert match_template(question, legacy) is None
+    assert match_template(question, typed) is not None
+    assert match_template("flights from delhi to hanoi", legacy) is not None
+
+
+def test_calendar_template_needs_its_summary_table():
+    question = "which day is cheapest to fly from delhi to hanoi"
+    flights = {"flights": {"flight_date"}}
+    assert match_template(question, flights) is None
+    assert match_template(question, dict(flights, route_fare_summary={"flight_date"})) is not None
+
+
+def test_inline_params_writes_values_as_literals():
+    sql = "SELECT * FROM flights WHERE origin = :origin AND airline = :airline LIMIT :limit"
+    params = {"origin": "New Delhi", "airline": "O'Hare Air", "limit": 10}
+    assert inline_params(sql, params) == (
+        "SELECT * FROM flights WHERE origin = 'New Delhi' AND airline = 'O''Hare Air' LIMIT 10"
+    )
+
+
+def test_inline_params_leaves_strings_and_unknown_names_alone():
+    sql = "SELECT ':origin' AS label, :other FROM flights WHERE origin = :origin"
+    assert inline_params(sql, {"origin": "Hanoi"}) == (
+        "SELECT ':origin' AS label, :other FROM flights WHERE origin = 'Hanoi'"
+    )
@@ -0,0 +1,126 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine
+
+from sql_validator import check_sql, VALID, INVALID, INCONCLUSIVE
+
+TODAY = date(2025, 1, 1)
+TABLES = ["flights", "route_fare_summary"]
+ROUTE = "origin = 'New Delhi' AND destination = 'Hanoi'"
+UNFILTERED = f"SELECT * FROM flights WHERE {ROUTE} LIMIT 10"
+
+
+@pytest.fixture(scope="module")
+def engine():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "CREATE TABLE flights (id INTEGER PRIMARY KEY, airline TEXT, time TEXT, date TEXT, "
+            "duration TEXT, flightType TEXT, price_inr INTEGER, origin TEXT, destination TEXT, "
+            "flight_date TEXT, departure_minutes INTEGER, duration_minutes INTEGER)"
+        )
+        conn.exec_driver_sql(
+            "CREATE TABLE route_fare_summary (origin TEXT, destination TEXT, flight_date TEXT, "
+            "min_price_inr INTEGER, median_price_inr REAL, max_price_inr INTEGER, flight_count INTEGER)"
+        )
+    return engine
+
+
+def check(question, sql, engine):
+    return check_sql(question, sql, engine, TABLES, today=TODAY).status
+
+
+@pytest.mark.parametrize("question", [
+    "flights from delhi to hanoi on 12 jan",
+    "flights from delhi to hanoi under 5000",
+    "flights from delhi to hanoi in the evening",
+    "flights from delhi to hanoi after 2 pm",
+    "how many flights from delhi to hanoi",
+    "average price of flights from delhi to hanoi",
+    "shortest flights from delhi to hanoi",
+    "flights from delhi to hanoi next weekend",
+])
+def test_unencoded_constraints_are_inconclusive(question, engine):
+    assert check(question, UNFILTERED, engine) == INCONCLUSIVE
+
+
+@pytest.mark.parametrize("question, sql", [
+    ("flights from delhi to hanoi",
+     UNFILTERED),
+    ("flights from delhi to hanoi on 12 jan",
+     f"SELECT * FROM flights WHERE {ROUTE} AND flight_date = '2025-01-12'"),
+    ("flights from delhi to hanoi under 5,000",
+     f"SELECT * FROM flights WHERE {ROUTE} AND price_inr < 5000"),
+    ("flights from delhi to hanoi in the evening",
+     f"SELECT * FROM flights WHERE {ROUTE} AND departure_minutes >= 1020"),
+    ("how many flights from delhi to hanoi",
+     f"SELECT COUNT(*) FROM flights WHERE {ROUTE}"),
+    ("average price of flights from delhi to hanoi",
+     f"SELECT AVG(price_inr) FROM flights WHERE {ROUTE}"),
+])
+def test_encoded_constraints_are_valid(question, sql, engine):
+    assert check(question, sql, engine) == VALID
+
+
+def test_wrong_date_is_inconclusive(engine):
+    sql = f"SELECT * FROM flights WHERE {ROUTE} AND flight_date = '2025-01-13'"
+    assert check("flights from delhi to hanoi on 12 jan", sql, engine) == INCONCLUSIVE
+
+
+def test_wrong_price_bound_is_inconclusive(engine):
+    sql = f"SELECT * FROM flights WHERE {ROUTE} AND price_inr < 8000"
+    assert check("flights from delhi to hanoi under 5000", sql, engine) == INCONCLUSIVE
+
+
+def test_unknown_city_is_invalid(engine):
+    sql = "SELECT * FROM flights WHERE origin = 'Paris' AND destination = 'Hanoi'"
+    assert check("flights from paris to hanoi", sql, engine) == INVALID
+
+
+@pytest.mark.parametrize("question, sql", [
+    ("flights from delhi to hanoi under 5000",
+     f"SELECT * FROM flights WHERE {ROUTE} AND price_inr > 5000"),
+    ("direct flights from delhi to hanoi",
+     f"SELECT * FROM flights WHERE {ROUTE} AND flightType NOT IN ('Nonstop')"),
+    ("cheapest flights from delhi to hanoi",
+     f"SELECT * FROM flights WHERE {ROUTE} ORDER BY price_inr DESC"),
+    ("flights from delhi to hanoi in the evening",
+     f"SELECT * FROM flights WHERE {ROUTE} AND departure_minutes < 600"),
+    ("flights from delhi to hanoi on 12 jan",
+     f"SELECT * FROM flights WHERE {ROUTE} AND flight_date != '2025-01-12'"),
+    ("flights from delhi to hanoi",
+     f"SELECT * FROM flights WHERE {ROUTE} AND airline = 'IndiGo'"),
+    ("flights from delhi to hanoi",
+     f"SELECT * FROM flights WHERE {ROUTE} OR 1=1"),
+    ("flights from delhi to hanoi",
+     f"SELECT * FROM flights WHERE {ROUTE} AND price_inr IS NULL"),
+    ("flights from delhi to hanoi after 2 pm",
+     f"SELECT * FROM flights WHERE {ROUTE} AND departure_minutes < 840"),
+])
+def test_misencoded_or_unexplained_predicates_are_inconclusive(question, sql, engine):
+    assert check(question, sql, engine) == INCONCLUSIVE
+
+
+@pytest.mark.parametrize("question, sql", [
+    ("cheapest direct flights from delhi to hanoi",
+     f"SELECT * FROM flights WHERE {ROUTE} AND flightType IN ('Nonstop', 'Direct') ORDER BY price_inr ASC"),
+    ("cheapest flight from delhi to hanoi",
+     f"SELECT * FROM flights WHERE {ROUTE} AND price_inr = "
+     f"(SELECT MIN(price_inr) FROM flights WHERE {ROUTE})"),
+    ("indigo flights from delhi to hanoi between 3000 and 5000",
+     f"SELECT * FROM flights WHERE {ROUTE} AND airline = 'IndiGo' AND price_inr BETWEEN 3000 AND 5000"),
+    ("flights from delhi to hanoi after 2:30 pm",
+     f"SELECT * FROM flights WHERE {ROUTE} AND departure_minutes >= 870"),
+    ("flights from delhi to hanoi in the morning",
+     f"SELECT * FROM flights WHERE LOWER(origin) = 'new delhi' AND destination = 'Hanoi' "
+     f"AND departure_minutes < 720"),
+])
+def test_matching_operators_and_directions_are_valid(question, sql, engine):
+    assert check(question, sql, engine) == VALID
+
+
+def test_replace_function_is_not_a_write(engine):
+    sql = f"SELECT REPLACE(duration, 'h', '') FROM flights WHERE {ROUTE}"
+    assert check("flights from delhi to hanoi", sql, engine) == VALID
+    assert check("flights from delhi to hanoi", "REPLACE INTO flights (id) VALUES (1)", engine) == INVALID
@@ -0,0 +1,70 @@
+import pytest
+
+from strip_think_tags import SentenceChunker, ThinkTagFilter, strip_think_tags
+
+TEXT = "Hi <think>plan the answer</think>there. <think>more</think>Bye"
+
+
+def stream(chunks):
+    think_filter = ThinkTagFilter()
+    visible = ''.join(think_filter.feed(chunk) for chunk in chunks)
+    return visible + think_filter.flush()
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 7, len(TEXT)])
+def test_tags_split_across_chunks_are_removed(size):
+    chunks = [TEXT[i:i + size] for i in range(0, len(TEXT), size)]
+    assert stream(chunks) == "Hi there. Bye"
+
+
+def test_partial_tag_is_held_back_until_decided():
+    think_filter = ThinkTagFilter()
+    assert think_filter.feed("a <thi") == "a "
+    assert think_filter.feed("s is not a tag") == "<this is not a tag"
+
+
+def test_held_back_text_is_released_by_flush():
+    think_filter = ThinkTagFilter()
+    assert think_filter.feed("ends with <") == "ends with "
+    assert think_filter.flush() == "<"
+
+
+def test_unclosed_think_block_is_dropped_and_reported():
+    think_filter = ThinkTagFilter()
+    assert think_filter.feed("answer <think>still reasoning") == "answer "
+    assert think_filter.in_think
+    assert think_filter.flush() == ""
+
+
+def test_strip_think_tags_on_a_whole_response():
+    assert strip_think_tags("<think>x</think>\n  Result  ") == "Result"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_chunker_flushes_at_sentence_ends():
+    chunker = SentenceChunker(max_latency=10, max_chars=100, clock=FakeClock())
+    assert chunker.feed("Two flights ") is None
+    assert chunker.feed("found.") == "Two flights found."
+
+
+def test_chunker_flushes_at_a_word_boundary_after_the_latency():
+    clock = FakeClock()
+    chunker = SentenceChunker(max_latency=0.25, max_chars=100, clock=clock)
+    assert chunker.feed("IndiGo") is None
+    clock.now = 0.3
+    assert chunker.feed("Air") is None  # mid-word: waits for a boundary
+    assert chunker.feed(" ") == "IndiGoAir "
+
+
+def test_chunker_flushes_long_text_without_boundaries():
+    chunker = SentenceChunker(max_latency=10, max_chars=4, clock=FakeClock())
+    assert chunker.feed("abcd") is None
+    assert chunker.feed("efgh") == "abcdefgh"
+    assert chunker.flush() == ""
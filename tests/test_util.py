@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+from db_pool import QueryResult
+from util import merge_streams, rows_as_dicts, unique_column_names
+
+
+def test_duplicate_columns_are_kept_apart():
+    result = QueryResult(("price", "price"), [(1, 2)])
+    assert rows_as_dicts(result) == [{"price": 1, "price_2": 2}]
+
+
+def test_suffixes_skip_names_already_taken():
+    assert unique_column_names(["a", "a_2", "a", "a"]) == ["a", "a_2", "a_3", "a_4"]
+
+
+async def _ticks(name, delays):
+    for delay in delays:
+        await asyncio.sleep(delay)
+        yield name
+
+
+def test_merge_streams_yields_items_as_they_are_produced():
+    async def collect():
+        return [item async for item in merge_streams(_ticks("answer", [0.01, 0.01, 0.01]),
+                                                      _ticks("luggage", [0.015]))]
+    assert asyncio.run(collect()) == ["answer", "luggage", "answer", "answer"]
+
+
+def test_merge_streams_raises_a_stream_error_and_cancels_the_rest():
+    cancelled = []
+
+    async def failing():
+        yield "first"
+        raise ValueError("boom")
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+            yield "never"
+        finally:
+            cancelled.append(True)
+
+    async def collect(items):
+        async for item in merge_streams(failing(), slow()):
+            items.append(item)
+
+    items = []
+    with pytest.raises(ValueError):
+        asyncio.run(collect(items))
+    assert items == ["first"] and cancelled == [True]